@@ -0,0 +1,44 @@
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.code_analyzer import PythonStaticAnalyzer  # noqa: E402
+
+
+# Сравнение regex и ast движков на больших сгенерированных классах
+def generate_class(name: str, methods: int, calls_per_method: int) -> str:
+    lines = [f"class {name}(Base):"]
+    for index in range(methods):
+        lines.append(f"    def method_{index}(self, value):")
+        for call in range(calls_per_method):
+            target = (index + call + 1) % methods
+            lines.append(f"        self.method_{target}(value)")
+            lines.append(f"        helper_{call}(value)")
+        lines.append("        return value")
+        lines.append("")
+    return "\n".join(lines) + "\n"
+
+
+def run(engine: str, folder: str) -> float:
+    analyzer = PythonStaticAnalyzer(folder, engine=engine)
+    started = time.perf_counter()
+    analyzer.analyze()
+    return time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    print(f"{'methods':>8} {'lines':>8} {'regex, s':>10} {'ast, s':>10} {'speedup':>8}")
+    for methods in (50, 200, 800, 1600):
+        with tempfile.TemporaryDirectory() as folder:
+            code = generate_class("Generated", methods, calls_per_method=5)
+            with open(os.path.join(folder, "generated.py"), "w", encoding="utf-8") as f:
+                f.write(code)
+            regex_time = run("regex", folder)
+            ast_time = run("ast", folder)
+            print(
+                f"{methods:>8} {code.count(chr(10)):>8} {regex_time:>10.3f} "
+                f"{ast_time:>10.3f} {regex_time / ast_time:>7.1f}x"
+            )
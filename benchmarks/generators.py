@@ -0,0 +1,124 @@
+import os
+import random
+from typing import Dict, List
+
+MONTH = "Sep"
+HOST = "synonyx-A-81"
+
+
+# Synthetic Python source tree: files_count files in directories of
+# files_per_directory, classes form inheritance chains of inheritance_depth
+def generate_source_tree(
+    root: str,
+    files_count: int = 100,
+    classes_per_file: int = 5,
+    methods_per_class: int = 8,
+    calls_per_method: int = 4,
+    inheritance_depth: int = 3,
+    files_per_directory: int = 20,
+    seed: int = 1,
+) -> Dict[str, List[str]]:
+    rng = random.Random(seed)
+    all_classes = [
+        f"Class{file_index}_{class_index}"
+        for file_index in range(files_count)
+        for class_index in range(classes_per_file)
+    ]
+    methods = {
+        class_name: [f"method_{index}" for index in range(methods_per_class)]
+        for class_name in all_classes
+    }
+
+    for file_index in range(files_count):
+        directory = os.path.join(root, f"package_{file_index // files_per_directory}")
+        os.makedirs(directory, exist_ok=True)
+        lines = ["import os", ""]
+        for class_index in range(classes_per_file):
+            class_name = f"Class{file_index}_{class_index}"
+            depth = class_index % max(1, inheritance_depth)
+            parent = f"Class{file_index}_{class_index - 1}" if depth else "object"
+            lines.append(f"class {class_name}({parent}):")
+            lines.append(f'    """Generated class {class_name}."""')
+            for method_name in methods[class_name]:
+                lines.append(f"    def {method_name}(self, value):")
+                lines.append("        # generated call site")
+                for _ in range(calls_per_method):
+                    if rng.random() < 0.7:
+                        lines.append(f"        self.{rng.choice(methods[class_name])}(value)")
+                    else:
+                        lines.append(f"        {rng.choice(all_classes)}()")
+                lines.append("        return value")
+                lines.append("")
+        with open(os.path.join(directory, f"module_{file_index}.py"), "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+    return methods
+
+
+def _prefix(seconds: int, program: str, pid: int) -> str:
+    day, rest = divmod(seconds, 86400)
+    hours, rest = divmod(rest, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{MONTH} {day + 3:>2} {hours:02}:{minutes:02}:{secs:02} {HOST} {program}[{pid}]:"
+
+
+def _performance_report(prefix: str, rng: random.Random) -> List[str]:
+    rss = 15 + rng.random() * 30
+    used = 300 + rng.random() * 300
+    return [
+        f"{prefix} INFO - tracer - ************ Performance Report ************",
+        f"{prefix} INFO - tracer - Global memory usage (RSS): {rss:.1f} MB",
+        f"{prefix} INFO - tracer - CPU load averages (1min, 5min, 15min): "
+        f"{rng.random() * 100:.2f}%, {rng.random() * 100:.2f}%, {rng.random() * 100:.2f}%",
+        f"{prefix} INFO - tracer - System total memory: 971.4 MB",
+        f"{prefix} INFO - tracer - System used memory: {used:.1f} MB",
+        f"{prefix} INFO - tracer - System available memory: {971.4 - used:.1f} MB",
+        f"{prefix} INFO - tracer - Total disk space: 8.2 GB",
+        f"{prefix} INFO - tracer - Free disk space: 6.2 GB",
+        f"{prefix} INFO - tracer - *******************************************",
+    ]
+
+
+# Synthetic syslog trace in the format of examples/*.tracer
+def generate_trace(
+    path: str,
+    methods: Dict[str, List[str]],
+    events: int = 100000,
+    processes: int = 3,
+    events_per_second: int = 500,
+    report_every: int = 2000,
+    exception_rate: float = 0.02,
+    function_rate: float = 0.05,
+    seed: int = 1,
+) -> int:
+    rng = random.Random(seed)
+    class_names = list(methods)
+    # Небольшое рабочее множество классов на процесс, как в реальных трассах
+    working_sets = [
+        rng.sample(class_names, min(len(class_names), 30)) for _ in range(processes)
+    ]
+    pids = [21974 + index * 17 for index in range(processes)]
+    lines_written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for index in range(events):
+            seconds = 18 * 3600 + index // events_per_second
+            process = rng.randrange(processes)
+            prefix = _prefix(seconds, "shell", pids[process])
+            if index % report_every == 0:
+                for line in _performance_report(_prefix(seconds, "python3", 19416), rng):
+                    f.write(line + "\n")
+                    lines_written += 1
+            class_name = rng.choice(working_sets[process])
+            method_name = rng.choice(methods[class_name])
+            roll = rng.random()
+            if roll < exception_rate:
+                line = f"{prefix} ERROR - tracer - Exception in {method_name}: ValueError - generated"
+            elif roll < exception_rate + function_rate:
+                line = (
+                    f"{prefix} INFO - tracer - Entering function: <listcomp> in "
+                    f"opt/synonym/lib/python3.7/site-packages/generated/module_{index % 50}.py"
+                )
+            else:
+                line = f"{prefix} INFO - tracer - Entering class: {class_name}, function: {method_name}"
+            f.write(line + "\n")
+            lines_written += 1
+    return lines_written
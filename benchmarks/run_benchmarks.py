@@ -0,0 +1,187 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.generators import generate_source_tree, generate_trace  # noqa: E402
+from src.code_analyzer import PythonStaticAnalyzer  # noqa: E402
+from src.diagramm_creater import GraphvizDiagramBuilder  # noqa: E402
+from src.plant_uml_generator import PlantUMLGenerator  # noqa: E402
+from src.tracer_analyzer import TracerAnalyzer  # noqa: E402
+
+# Бенчмарк всех стадий конвейера на синтетических данных.
+#   python benchmarks/run_benchmarks.py --save-baseline   # записать эталон
+#   python benchmarks/run_benchmarks.py                   # сравнить с эталоном
+# Код возврата 1, если какая-то стадия медленнее эталона больше чем на tolerance,
+# 2 - если эталона нет (сначала --save-baseline).
+SIZES = {
+    "small": {"files": 50, "classes": 4, "methods": 6, "calls": 3, "events": 20000},
+    "medium": {"files": 300, "classes": 5, "methods": 8, "calls": 4, "events": 200000},
+    "large": {"files": 1500, "classes": 6, "methods": 10, "calls": 5, "events": 1000000},
+}
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def measure(stage: Callable[[], int], setup: Callable[[], None], repeat: int) -> Dict:
+    # Время - лучший из repeat прогонов без tracemalloc, пик памяти - отдельный прогон
+    best = float("inf")
+    items = 0
+    for _ in range(repeat):
+        setup()
+        started = time.perf_counter()
+        items = stage()
+        best = min(best, time.perf_counter() - started)
+    setup()
+    tracemalloc.start()
+    stage()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "seconds": round(best, 6),
+        "items": items,
+        "throughput": round(items / best, 1) if best > 0 else None,
+        "peak_mb": round(peak / 1024 / 1024, 3),
+    }
+
+
+def run_size(name: str, params: Dict, repeat: int, workdir: str) -> Dict[str, Dict]:
+    source_root = os.path.join(workdir, f"{name}_src")
+    trace_path = os.path.join(workdir, f"{name}.tracer")
+    methods = generate_source_tree(
+        source_root,
+        files_count=params["files"],
+        classes_per_file=params["classes"],
+        methods_per_class=params["methods"],
+        calls_per_method=params["calls"],
+    )
+    generate_trace(trace_path, methods, events=params["events"])
+    with open(trace_path, encoding="utf-8") as f:
+        log = f.read()
+
+    state = {}
+    base = PythonStaticAnalyzer(source_root)
+    base.analyze()
+    full_model = base.get_model()
+    tracers = TracerAnalyzer(log).parse()
+
+    def analyze() -> int:
+        analyzer = PythonStaticAnalyzer(source_root)
+        analyzer.analyze()
+        return params["files"]
+
+    def parse() -> int:
+        return len(TracerAnalyzer(log).parse())
+
+    def setup_filter():
+        state["analyzer"] = PythonStaticAnalyzer(source_root)
+        state["analyzer"].model = dict(full_model)
+
+    def filter_model() -> int:
+        state["analyzer"].filter_model_by_tracer(tracers)
+        return len(tracers)
+
+    def build_diagram() -> int:
+        GraphvizDiagramBuilder(full_model).build_diagram()
+        return len(full_model)
+
+    def sequence_diagram() -> int:
+        puml_file = os.path.join(workdir, f"{name}.puml")
+        PlantUMLGenerator(tracers).generate_sequence_diagram(puml_file)
+        return len(tracers)
+
+    def no_setup():
+        pass
+
+    stages: Dict[str, Tuple[Callable[[], int], Callable[[], None], str]] = {
+        "PythonStaticAnalyzer.analyze": (analyze, no_setup, "files/s"),
+        "TracerAnalyzer.parse": (parse, no_setup, "lines/s"),
+        "filter_model_by_tracer": (filter_model, setup_filter, "events/s"),
+        "build_diagram": (build_diagram, no_setup, "classes/s"),
+        "generate_sequence_diagram": (sequence_diagram, no_setup, "events/s"),
+    }
+    results = {}
+    for stage_name, (stage, setup, unit) in stages.items():
+        results[stage_name] = measure(stage, setup, repeat)
+        results[stage_name]["unit"] = unit
+        result = results[stage_name]
+        print(
+            f"{name:>7} {stage_name:<30} {result['seconds']:>9.3f} s "
+            f"{result['throughput'] or 0:>12.0f} {unit:<10} {result['peak_mb']:>8.1f} MB"
+        )
+    return results
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> list:
+    regressions = []
+    for size, stages in results.items():
+        for stage_name, result in stages.items():
+            reference = baseline.get(size, {}).get(stage_name)
+            if not reference:
+                continue
+            for metric in ("seconds", "peak_mb"):
+                if reference[metric] and result[metric] > reference[metric] * (1 + tolerance):
+                    regressions.append(
+                        f"{size} {stage_name}: {metric} {result[metric]} "
+                        f"vs baseline {reference[metric]} "
+                        f"(+{(result[metric] / reference[metric] - 1) * 100:.0f}%)"
+                    )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Pipeline stage benchmarks")
+    parser.add_argument("--sizes", default="small,medium", help=f"comma separated: {', '.join(SIZES)}")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--output", help="write results JSON to this file")
+    args = parser.parse_args()
+
+    sizes = args.sizes.split(",")
+    baseline = None
+    if not args.save_baseline:
+        # Без эталона проверка регрессий не имеет смысла - ошибка до прогона
+        if not os.path.exists(args.baseline):
+            print(f"Baseline {args.baseline} не найден, запустите с --save-baseline")
+            return 2
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        missing = [size for size in sizes if size not in baseline]
+        if missing:
+            print(f"В baseline {args.baseline} нет размеров: {', '.join(missing)}")
+            return 2
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            results[size] = run_size(size, SIZES[size], args.repeat, workdir)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+        print(f"Baseline сохранён в {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\nREGRESSION:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print("\nНет регрессий относительно baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
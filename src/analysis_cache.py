@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from dataclasses import asdict
+from typing import Dict, Iterable, List, Optional
+
+
+# Persistent per-file cache of extraction results
+class AnalysisCache:
+    # 2: классы хранят строки начала/конца (lineno, end_lineno)
+    # 3: отдельная запись на пару (путь, движок)
+    VERSION = 3
+
+    def __init__(self, cache_file: str = ".analysis_cache.json", max_entries: int = 20000):
+        self.cache_file = cache_file
+        self.max_entries = max_entries
+        # "engine|path" -> {"path": ..., "mtime": ..., "size": ..., "hash": ..., "classes": [...]}
+        self.entries: "OrderedDict[str, dict]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        self.load()
+
+    @staticmethod
+    def _content_hash(file_path: str) -> str:
+        digest = hashlib.sha1()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 16), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _entry_key(file_path: str, key: str) -> str:
+        # Результаты разных движков хранятся рядом и не вытесняют друг друга
+        return f"{key}|{file_path}"
+
+    def load(self):
+        if not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: analysis cache {self.cache_file} ignored: {e}")
+            return
+        if data.get("version") != self.VERSION:
+            return
+        self.entries = OrderedDict(data.get("entries", {}))
+
+    def save(self):
+        if not self._dirty:
+            return
+        tmp_file = f"{self.cache_file}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(
+                {"version": self.VERSION, "entries": self.entries},
+                f,
+                ensure_ascii=False,
+            )
+        os.replace(tmp_file, self.cache_file)
+        self._dirty = False
+
+    def get(self, file_path: str, key: str = "") -> Optional[List[dict]]:
+        entry_key = self._entry_key(file_path, key)
+        entry = self.entries.get(entry_key)
+        if entry is None:
+            self.misses += 1
+            return None
+        stat = os.stat(file_path)
+        if entry["mtime"] != stat.st_mtime_ns or entry["size"] != stat.st_size:
+            # mtime мог измениться без изменения содержимого (checkout, touch)
+            if entry["size"] != stat.st_size or entry["hash"] != self._content_hash(file_path):
+                self.misses += 1
+                return None
+            entry["mtime"] = stat.st_mtime_ns
+            self._dirty = True
+        self.entries.move_to_end(entry_key)
+        self.hits += 1
+        return entry["classes"]
+
+    def put(
+        self,
+        file_path: str,
+        classes: Iterable,
+        key: str = "",
+        fingerprint: Optional[dict] = None,
+    ):
+        # fingerprint - mtime/size/hash байтов, которые реально разбирались;
+        # иначе файл, изменённый после разбора, закрепил бы устаревшие классы
+        if fingerprint is None:
+            stat = os.stat(file_path)
+            fingerprint = {
+                "mtime": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "hash": self._content_hash(file_path),
+            }
+        entry_key = self._entry_key(file_path, key)
+        self.entries[entry_key] = {
+            "path": file_path,
+            "mtime": fingerprint["mtime"],
+            "size": fingerprint["size"],
+            "hash": fingerprint["hash"],
+            "classes": [asdict(class_model) for class_model in classes],
+        }
+        self.entries.move_to_end(entry_key)
+        self._dirty = True
+
+    def evict(self, live_paths: Iterable[str], scope: str = ""):
+        # Удаляем записи для удалённых файлов внутри scope и самые старые сверх лимита
+        live = set(live_paths)
+        # Сравнение с разделителем: scope /x/proj не должен задевать /x/proj2
+        prefix = scope.rstrip(os.sep) + os.sep if scope else ""
+        stale = [
+            entry_key
+            for entry_key, entry in self.entries.items()
+            if entry["path"].startswith(prefix) and entry["path"] not in live
+        ]
+        for entry_key in stale:
+            del self.entries[entry_key]
+            self._dirty = True
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self._dirty = True
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries)}
@@ -0,0 +1,83 @@
+import ast
+import re
+from typing import Dict, List
+
+from src.code_analyzer import ClassModel, MethodModel
+
+
+# Single pass extractor: walks the syntax tree once, each method body is
+# scanned only within its own span; class/method line spans are recorded
+class AstExtractor(ast.NodeVisitor):
+    def __init__(self, directory: str, filename: str):
+        self.directory = directory
+        self.filename = filename
+        self.classes: Dict[str, ClassModel] = {}
+
+    @staticmethod
+    def _sanitize_name(name):
+        return re.sub(r"\[.*?\]", "", name)
+
+    @staticmethod
+    def _call_name(node: ast.Call):
+        func = node.func
+        if isinstance(func, ast.Name):
+            return func.id
+        if isinstance(func, ast.Attribute):
+            return func.attr
+        return None
+
+    def _method_calls(self, method_node) -> List[str]:
+        calls = []
+        for statement in method_node.body:
+            for node in ast.walk(statement):
+                if isinstance(node, ast.Call):
+                    name = self._call_name(node)
+                    if name:
+                        calls.append(self._sanitize_name(name))
+        return calls
+
+    def visit_ClassDef(self, node: ast.ClassDef):
+        class_name = self._sanitize_name(node.name)
+        parents = [
+            self._sanitize_name(ast.unparse(base).strip().replace(".", "_"))
+            for base in node.bases
+        ]
+        class_model = ClassModel(
+            name=class_name,
+            parents=parents,
+            directory=self.directory,
+            filename=self.filename,
+            lineno=node.lineno,
+            end_lineno=node.end_lineno or node.lineno,
+        )
+
+        method_nodes = [
+            item
+            for item in node.body
+            if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef))
+        ]
+        method_names = {item.name for item in method_nodes}
+        unique_calls = set()
+        for item in method_nodes:
+            method_model = MethodModel(
+                name=item.name,
+                lineno=item.lineno,
+                end_lineno=item.end_lineno or item.lineno,
+            )
+            for called_name in self._method_calls(item):
+                if called_name in method_names:
+                    method_model.calls.append(called_name)
+                elif called_name not in unique_calls and called_name != class_name:
+                    method_model.calls.append(called_name)
+                    unique_calls.add(called_name)
+            class_model.methods.append(method_model)
+
+        self.classes[class_name] = class_model
+        # Вложенные классы тоже попадают в модель, как и в regex-движке
+        self.generic_visit(node)
+
+
+def extract_classes(code: str, directory: str, filename: str) -> List[ClassModel]:
+    extractor = AstExtractor(directory, filename)
+    extractor.visit(ast.parse(code))
+    return list(extractor.classes.values())
@@ -1,17 +1,24 @@
+import hashlib
 import json
+from concurrent.futures import ProcessPoolExecutor
 from operator import methodcaller
 import os
-from dataclasses import asdict, dataclass, field
+from dataclasses import asdict, dataclass, field, replace
 import re
-from typing import List, Dict
+from typing import Iterable, List, Dict, Optional, Tuple
 
-from src.tracer_analyzer import Tracer, TracerAnalyzer
+from src.analysis_cache import AnalysisCache
+from src.profiling import profiler
+from src.tracer_analyzer import EVENT_EXCEPTION, Tracer, TracerAnalyzer
 
 
 @dataclass
 class MethodModel:
     name: str
     calls: List[str] = field(default_factory=list)
+    # Строки начала и конца метода (0 - неизвестно, regex-движок их не знает)
+    lineno: int = 0
+    end_lineno: int = 0
 
 
 @dataclass
@@ -22,6 +29,8 @@ class ClassModel:
     calls: List[str] = field(default_factory=list)
     directory: str = ""
     filename: str = ""
+    lineno: int = 0
+    end_lineno: int = 0
 
 
 @dataclass
@@ -30,26 +39,260 @@ class TracerConnection:
     method_from: str = ""
     class_to: str = ""
     method_to: str = ""
+    # Частота перехода: число срабатываний, первый/последний шаг,
+    # число различных вызывающих точек для цели перехода
+    count: int = 0
+    first_step: int = 0
+    last_step: int = 0
+    callers: int = 0
+
+
+# Hash-based counter of transitions between consecutive trace events
+class TracerEdgeCounter:
+    def __init__(self, pid: Optional[int] = None):
+        # Если задан pid, учитываются только события этого процесса
+        self.pid = pid
+        self.edges: Dict[Tuple, TracerConnection] = {}
+        self.classes: Dict[str, None] = {}
+        self.steps = 0
+        self._last_points: Dict[Optional[int], Tuple] = {}
+        self._callers: Dict[Tuple, set] = {}
+
+    def add(self, line: Tracer) -> bool:
+        # Возвращает True, если появилась новая связь
+        if self.pid is not None and line.pid != self.pid:
+            return False
+        # Исключения и события без класса переходами не считаются
+        if not line.class_name or line.event == EVENT_EXCEPTION:
+            return False
+        self.classes.setdefault(line.class_name, None)
+        point = (line.class_name, line.method_name)
+        # Соседние события связываются только внутри одного процесса
+        previous = self._last_points.get(line.pid)
+        self._last_points[line.pid] = point
+        if previous is None:
+            return False
+
+        self.steps += 1
+        signature = previous + point
+        connection = self.edges.get(signature)
+        is_new = connection is None
+        if is_new:
+            connection = TracerConnection(
+                class_from=previous[0],
+                method_from=previous[1],
+                class_to=point[0],
+                method_to=point[1],
+                first_step=self.steps,
+            )
+            self.edges[signature] = connection
+            self._callers.setdefault(point, set()).add(previous)
+        connection.count += 1
+        connection.last_step = self.steps
+        return is_new
+
+    def add_all(self, tracer: Iterable[Tracer]) -> int:
+        return sum(self.add(line) for line in tracer)
+
+    def snapshot(self) -> "TracerEdgeCounter":
+        # Независимая копия для чтения из другого потока (рендер в trace_follower)
+        copy = TracerEdgeCounter(self.pid)
+        copy.edges = {signature: replace(conn) for signature, conn in self.edges.items()}
+        copy.classes = dict(self.classes)
+        copy.steps = self.steps
+        copy._last_points = dict(self._last_points)
+        copy._callers = {point: set(callers) for point, callers in self._callers.items()}
+        return copy
+
+    def connections(self) -> List[TracerConnection]:
+        # Связи в порядке первого появления, как и прежде
+        for signature, connection in self.edges.items():
+            connection.callers = len(self._callers[signature[2:]])
+        return list(self.edges.values())
+
+
+def class_model_from_dict(data: dict) -> ClassModel:
+    return ClassModel(
+        name=data["name"],
+        methods=[MethodModel(**method) for method in data.get("methods", [])],
+        parents=list(data.get("parents", [])),
+        calls=[
+            TracerConnection(**call) if isinstance(call, dict) else call
+            for call in data.get("calls", [])
+        ],
+        directory=data.get("directory", ""),
+        filename=data.get("filename", ""),
+        lineno=data.get("lineno", 0),
+        end_lineno=data.get("end_lineno", 0),
+    )
+
+
+def add_missing_parents(model: Dict[str, ClassModel]) -> List[str]:
+    # Родители, которых нет в модели, добавляются заглушками; возвращает их имена
+    added = []
+    for class_model in list(model.values()):
+        if not isinstance(class_model, ClassModel):
+            continue
+        for parent in class_model.parents:
+            if parent not in model:
+                model[parent] = ClassModel(
+                    name=parent,
+                    directory="python_and_other_modules",
+                    filename="path unknown",
+                )
+                added.append(parent)
+    return added
+
+
+def load_model_json(filepath) -> Dict[str, ClassModel]:
+    # Обратная операция к save_model_to_json: рендер без повторного анализа
+    with open(filepath, "r", encoding="utf-8") as f:
+        model_dict = json.load(f)
+
+    model = {}
+    for class_name, data in model_dict.items():
+        if class_name == "tracer":
+            model[class_name] = [TracerConnection(**conn) for conn in data]
+        else:
+            model[class_name] = class_model_from_dict(data)
+    return model
+
+
+ENGINES = ("regex", "ast")
+
+
+def _analyze_file(task: Tuple[str, str, str]) -> Tuple[List[ClassModel], dict]:
+    # Разбор одного файла; вынесено на уровень модуля, чтобы работать в пуле процессов.
+    # Вместе с классами возвращается отпечаток именно прочитанных байтов для кэша
+    root, file, engine = task
+    file_analyzer = PythonStaticAnalyzer(root)
+    with open(os.path.join(root, file), "rb") as f:
+        stat = os.fstat(f.fileno())
+        data = f.read()
+    fingerprint = {
+        "mtime": stat.st_mtime_ns,
+        "size": len(data),
+        "hash": hashlib.sha1(data).hexdigest(),
+    }
+    # Как при чтении в текстовом режиме: универсальные переводы строк
+    code = data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+    if engine == "ast":
+        from src.ast_extractor import extract_classes
+
+        try:
+            return extract_classes(code, root, file), fingerprint
+        except (SyntaxError, ValueError):
+            # Файл не разбирается текущей версией Python - откатываемся на regex
+            pass
+    code = file_analyzer._remove_comments_from_code(code)
+    file_analyzer._extract_classes(code, root, file)
+    file_analyzer._extract_methods_and_calls(code)
+    return list(file_analyzer.model.values()), fingerprint
 
 
 class PythonStaticAnalyzer:
-    def __init__(self, folder_path):
+    def __init__(
+        self,
+        folder_path,
+        workers: Optional[int] = 1,
+        cache: Optional[AnalysisCache] = None,
+        engine: str = "regex",
+    ):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine {engine!r}, expected one of {ENGINES}")
         self.folder_path = folder_path
+        # workers=1 - последовательный разбор, None - по числу ядер
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        # Кэш результатов по файлам: неизменённые файлы не разбираются повторно
+        self.cache = cache
+        # regex - исходный движок, ast - однопроходный линейный разбор
+        self.engine = engine
         self.model: Dict[str, ClassModel] = {}
         self.all_classes = set()
+        # Все найденные классы по файлам, включая одноимённые из разных файлов
+        self.class_list: List[ClassModel] = []
+
+    def _collect_files(self) -> List[Tuple[str, str, str]]:
+        # Сортируем обход, чтобы порядок классов в модели не зависел от файловой системы
+        tasks = []
+        for root, dirs, files in os.walk(self.folder_path):
+            dirs.sort()
+            for file in sorted(files):
+                if file.endswith(".py"):
+                    tasks.append((root, file, self.engine))
+        return tasks
 
     def analyze(self):
-        for root, _, files in os.walk(self.folder_path):
-            for file in files:
-                if file.endswith(".py"):
-                    file_path = os.path.join(root, file)
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        code = f.read()
-                        code = self._remove_comments_from_code(code)
-                        self._extract_classes(code, root, file)
-                        self._extract_methods_and_calls(code)
+        # Повторный запуск строит модель заново, а не дописывает к прошлой
+        self.model = {}
+        self.all_classes = set()
+        self.class_list = []
+        with profiler.stage("analyze.walk"):
+            tasks = self._collect_files()
+            paths = [os.path.abspath(os.path.join(root, file)) for root, file, _ in tasks]
+        results: List[Optional[List[ClassModel]]] = [None] * len(tasks)
+
+        if self.cache is not None:
+            with profiler.stage("analyze.cache_lookup"):
+                for index, file_path in enumerate(paths):
+                    cached = self.cache.get(file_path, key=self.engine)
+                    if cached is not None:
+                        # Ключ кэша - абсолютный путь, а directory в модели - путь
+                        # относительно текущего folder_path, поэтому проставляем заново
+                        root, file, _ = tasks[index]
+                        results[index] = [class_model_from_dict(item) for item in cached]
+                        for class_model in results[index]:
+                            class_model.directory = root
+                            class_model.filename = file
+
+        pending = [index for index, result in enumerate(results) if result is None]
+        pending_tasks = [tasks[index] for index in pending]
+        with profiler.stage(f"analyze.extract.{self.engine}"):
+            if self.workers > 1 and len(pending_tasks) > 1:
+                chunksize = max(1, len(pending_tasks) // (self.workers * 4))
+                with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                    parsed = list(
+                        executor.map(_analyze_file, pending_tasks, chunksize=chunksize)
+                    )
+            else:
+                parsed = [_analyze_file(task) for task in pending_tasks]
+
+        for index, (file_classes, fingerprint) in zip(pending, parsed):
+            results[index] = file_classes
+            if self.cache is not None:
+                self.cache.put(
+                    paths[index], file_classes, key=self.engine, fingerprint=fingerprint
+                )
+
+        if self.cache is not None:
+            with profiler.stage("analyze.cache_save"):
+                self.cache.evict(paths, scope=os.path.abspath(self.folder_path))
+                self.cache.save()
+
+        # Слияние в порядке обхода: результат совпадает с последовательным запуском
+        for file_classes in results:
+            self._merge_classes(file_classes)
 
         self._add_missing_parents()
+        if profiler.enabled:
+            # Разбор идёт и в дочерних процессах, поэтому счётчики собираются здесь
+            profiler.count("analyze.files", len(tasks))
+            profiler.count("analyze.files_parsed", len(pending_tasks))
+            profiler.count("analyze.bytes_read", sum(fingerprint["size"] for _, fingerprint in parsed))
+            profiler.count("analyze.classes", len(self.class_list))
+            profiler.count(
+                "analyze.methods", sum(len(c.methods) for c in self.class_list)
+            )
+            profiler.count(
+                "analyze.calls",
+                sum(len(m.calls) for c in self.class_list for m in c.methods),
+            )
+
+    def _merge_classes(self, classes: List[ClassModel]):
+        for class_model in classes:
+            self.model[class_model.name] = class_model
+            self.all_classes.add(class_model.name)
+            self.class_list.append(class_model)
 
     def _remove_comments_from_code(self, code):
         code = re.sub(r"(?<!\\)#.*", "", code)
@@ -113,18 +356,9 @@ class PythonStaticAnalyzer:
                         method_model.calls.append(called_name)
                         unique_calls.add(called_name)
 
-    def _add_missing_parents(self):
-        val = self.model.copy()
-        for class_model in val.values():
-            for parent in class_model.parents:
-                if parent not in self.model:
-                    # Добавляем родительский класс в модель
-                    self.model[parent] = ClassModel(
-                        name=parent,
-                        directory="python_and_other_modules",
-                        filename="path unknown",
-                    )
-                    self.all_classes.add(parent)
+    def _add_missing_parents(self, model: Optional[Dict[str, ClassModel]] = None):
+        model = self.model if model is None else model
+        self.all_classes.update(add_missing_parents(model))
 
     def get_model(self):
         return self.model
@@ -152,7 +386,12 @@ class PythonStaticAnalyzer:
                     "calls": calls,
                     "directory": class_model.directory,
                     "filename": class_model.filename,
+                    "lineno": class_model.lineno,
+                    "end_lineno": class_model.end_lineno,
                 }
+            elif class_name == "tracer":
+                # Связи трассировки сохраняются, чтобы модель можно было загрузить обратно
+                model_dict[class_name] = [asdict(conn) for conn in class_model]
             else:
                 print(
                     f"Warning: Expected ClassModel but got {type(class_model)} for {class_name}"
@@ -161,48 +400,39 @@ class PythonStaticAnalyzer:
         with open(filepath, "w", encoding="utf-8") as f:
             json.dump(model_dict, f, indent=4, ensure_ascii=False)
 
-    def filter_model_by_tracer(self, tracer: List[Tracer]):
-        all_tracer_classes = {el.class_name for el in tracer}
-        model_val = self.model.copy()
+    def load_model_from_json(self, filepath) -> Dict[str, ClassModel]:
+        self.model = load_model_json(filepath)
+        self.all_classes.update(name for name in self.model if name != "tracer")
+        return self.model
+
+    def build_tracer_model(
+        self,
+        counter: TracerEdgeCounter,
+        base_model: Optional[Dict[str, ClassModel]] = None,
+    ) -> Dict[str, ClassModel]:
+        # Модель только из классов трассировки; self.model не изменяется
+        base_model = self.model if base_model is None else base_model
         filtred_model = {}
-        for _name, _class in model_val.items():
-            if _name in all_tracer_classes:
+        for _name, _class in base_model.items():
+            if _name in counter.classes and isinstance(_class, ClassModel):
                 filtred_model[_name] = _class
-        self.model = filtred_model
-        self._add_missing_parents()
-        tracer_conn = []
-        saved_trace_point = None
-        # add tracer connections
-        for line in tracer:
-            if line.class_name or line.method_name:
-                if not saved_trace_point:
-                    saved_trace_point = TracerConnection(
-                        class_from=line.class_name,
-                        method_from=line.method_name,
-                    )
-                else:
-                    saved_trace_point.class_to = line.class_name
-                    saved_trace_point.method_to = line.method_name
-
-                    tracer_conn.append(saved_trace_point)
-                    saved_trace_point = TracerConnection(
-                        class_from=line.class_name,
-                        method_from=line.method_name,
-                    )
-
-        unique_tracer_connections = []
-        seen_connections = set()
-
-        for conn in tracer_conn:
-            # Создаем кортеж для уникальной проверки
-            conn_signature = (
-                conn.class_from,
-                conn.method_from,
-                conn.class_to,
-                conn.method_to,
-            )
-            if conn_signature not in seen_connections:
-                seen_connections.add(conn_signature)
-                unique_tracer_connections.append(conn)
-
-        self.model["tracer"] = unique_tracer_connections
+        self._add_missing_parents(filtred_model)
+        filtred_model["tracer"] = counter.connections()
+        return filtred_model
+
+    def filter_model_by_tracer(self, tracer: Iterable[Tracer], pid: Optional[int] = None):
+        # Один проход по трассировке: принимает и список, и ленивый поток событий.
+        # Переходы считаются в TracerEdgeCounter, поэтому весь лог в памяти не хранится;
+        # pid ограничивает трассировку одним процессом
+        from src.path_index import TraceAttributor
+
+        with profiler.stage("filter_model_by_tracer"):
+            counter = TracerEdgeCounter(pid)
+            # События "Entering function ... in <path>" привязываются к классам модели
+            attributor = TraceAttributor(self.model)
+            counter.add_all(attributor.attribute_all(tracer))
+            self.model = self.build_tracer_model(counter)
+        profiler.count("tracer.transitions", counter.steps)
+        profiler.count("tracer.edges", len(counter.edges))
+        profiler.count("tracer.attributed", attributor.attributed)
+        profiler.count("tracer.unattributed", attributor.unattributed)
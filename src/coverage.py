@@ -0,0 +1,224 @@
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from src.code_analyzer import ClassModel, PythonStaticAnalyzer
+from src.diagramm_creater import GraphvizDiagramBuilder, Modes
+from src.tracer_analyzer import Tracer, stream_tracers
+
+HIT_COLOR = "#B8E6B8"
+MISSED_COLOR = "#F4B6B6"
+PARTIAL_COLOR = "#F8E7A1"
+
+MethodKey = Tuple[str, str]
+
+
+def _popcount(bits: int) -> int:
+    return bin(bits).count("1")
+
+
+def _hit_methods(trace_file: str) -> Set[MethodKey]:
+    # Выполняется в дочернем процессе: в родителя уходят только пары (класс, метод)
+    return {
+        (tracer.class_name, tracer.method_name)
+        for tracer in stream_tracers(trace_file, skip_unmatched=True, keep_raw=False)
+        if tracer.class_name and tracer.method_name
+    }
+
+
+# Покрытие статической модели трассами: у каждого метода свой номер бита,
+# трасса - одно целое число (bitset), запросы по тысячам трасс - побитовые операции
+class CoverageMatrix:
+    def __init__(self, model: Dict[str, ClassModel]):
+        self.model = model
+        self.methods: List[MethodKey] = []
+        self.method_index: Dict[MethodKey, int] = {}
+        # Маска методов класса для подсчёта покрытия по классам
+        self.class_masks: Dict[str, int] = {}
+        for class_name, class_info in model.items():
+            if not isinstance(class_info, ClassModel):
+                continue
+            mask = 0
+            for method in class_info.methods:
+                key = (class_name, method.name)
+                if key in self.method_index:
+                    continue
+                self.method_index[key] = len(self.methods)
+                self.methods.append(key)
+                mask |= 1 << self.method_index[key]
+            self.class_masks[class_name] = mask
+        self.all_methods = (1 << len(self.methods)) - 1
+        self.traces: Dict[str, int] = {}
+
+    def bits_of(self, hits: Iterable[MethodKey]) -> int:
+        bits = 0
+        index = self.method_index
+        for key in hits:
+            position = index.get(key)
+            if position is not None:
+                bits |= 1 << position
+        return bits
+
+    def add_trace(self, name: str, tracers: Iterable[Tracer]) -> int:
+        hits = {
+            (tracer.class_name, tracer.method_name)
+            for tracer in tracers
+            if tracer.class_name and tracer.method_name
+        }
+        self.traces[name] = self.bits_of(hits)
+        return self.traces[name]
+
+    def add_trace_files(self, trace_files: Iterable[str], workers: Optional[int] = None):
+        # Логи разбираются параллельно, имя трассы - путь к файлу как передан:
+        # одноимённые логи из разных каталогов не перезаписывают друг друга
+        trace_files = list(trace_files)
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(trace_files) <= 1:
+            results = map(_hit_methods, trace_files)
+            for trace_file, hits in zip(trace_files, results):
+                self.traces[trace_file] = self.bits_of(hits)
+            return
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for trace_file, hits in zip(trace_files, executor.map(_hit_methods, trace_files)):
+                self.traces[trace_file] = self.bits_of(hits)
+
+    def _selected(self, names: Optional[Iterable[str]]) -> List[int]:
+        if names is None:
+            return list(self.traces.values())
+        return [self.traces[name] for name in names]
+
+    def union(self, names: Optional[Iterable[str]] = None) -> int:
+        bits = 0
+        for trace_bits in self._selected(names):
+            bits |= trace_bits
+        return bits
+
+    def intersection(self, names: Optional[Iterable[str]] = None) -> int:
+        selected = self._selected(names)
+        if not selected:
+            return 0
+        bits = self.all_methods
+        for trace_bits in selected:
+            bits &= trace_bits
+        return bits
+
+    def never_hit(self, names: Optional[Iterable[str]] = None) -> List[MethodKey]:
+        return self.decode(self.all_methods & ~self.union(names))
+
+    def decode(self, bits: int) -> List[MethodKey]:
+        methods = []
+        while bits:
+            lowest = bits & -bits
+            methods.append(self.methods[lowest.bit_length() - 1])
+            bits ^= lowest
+        return methods
+
+    def traces_hitting(self, class_name: str, method_name: str) -> List[str]:
+        bit = 1 << self.method_index[(class_name, method_name)]
+        return [name for name, bits in self.traces.items() if bits & bit]
+
+    def hit_counts(self) -> List[int]:
+        # Число трасс на метод; обход только установленных битов
+        counts = [0] * len(self.methods)
+        for bits in self.traces.values():
+            while bits:
+                lowest = bits & -bits
+                counts[lowest.bit_length() - 1] += 1
+                bits ^= lowest
+        return counts
+
+    def class_coverage(self, bits: Optional[int] = None) -> Dict[str, Tuple[int, int]]:
+        bits = self.union() if bits is None else bits
+        return {
+            class_name: (_popcount(bits & mask), _popcount(mask))
+            for class_name, mask in self.class_masks.items()
+        }
+
+    def colors(self, bits: Optional[int] = None):
+        bits = self.union() if bits is None else bits
+        method_colors: Dict[str, Dict[str, str]] = {}
+        for position, (class_name, method_name) in enumerate(self.methods):
+            color = HIT_COLOR if bits >> position & 1 else MISSED_COLOR
+            method_colors.setdefault(class_name, {})[method_name] = color
+        class_colors = {}
+        for class_name, (hit, total) in self.class_coverage(bits).items():
+            if total:
+                class_colors[class_name] = (
+                    HIT_COLOR if hit == total else MISSED_COLOR if hit == 0 else PARTIAL_COLOR
+                )
+        return class_colors, method_colors
+
+    def diagram_builder(self, bits: Optional[int] = None) -> GraphvizDiagramBuilder:
+        # Статическая модель без связей трассировки, раскрашенная по покрытию
+        model = {
+            name: info for name, info in self.model.items() if isinstance(info, ClassModel)
+        }
+        class_colors, method_colors = self.colors(bits)
+        return GraphvizDiagramBuilder(
+            model,
+            Modes.CONNECTIONS,
+            class_colors=class_colors,
+            method_colors=method_colors,
+        )
+
+    def report_rows(self) -> List[Dict[str, object]]:
+        counts = self.hit_counts()
+        rows = []
+        for position, (class_name, method_name) in enumerate(self.methods):
+            class_info = self.model[class_name]
+            rows.append(
+                {
+                    "class": class_name,
+                    "method": method_name,
+                    "file": os.path.join(class_info.directory, class_info.filename),
+                    "traces": counts[position],
+                    "hit": counts[position] > 0,
+                }
+            )
+        return rows
+
+    def save_csv(self, output_file: str):
+        with open(output_file, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=["class", "method", "file", "traces", "hit"])
+            writer.writeheader()
+            writer.writerows(self.report_rows())
+
+    def save_json(self, output_file: str):
+        union = self.union()
+        report = {
+            "methods_total": len(self.methods),
+            "methods_hit": _popcount(union),
+            "traces": {name: _popcount(bits) for name, bits in self.traces.items()},
+            "classes": {
+                class_name: {"hit": hit, "total": total}
+                for class_name, (hit, total) in self.class_coverage(union).items()
+            },
+            "never_hit": [
+                f"{class_name}.{method_name}"
+                for class_name, method_name in self.decode(self.all_methods & ~union)
+            ],
+            "methods": self.report_rows(),
+        }
+        with open(output_file, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    analyzer = PythonStaticAnalyzer("src")
+    analyzer.analyze()
+
+    coverage = CoverageMatrix(analyzer.get_model())
+    log_dir = "examples"
+    coverage.add_trace_files(
+        os.path.join(log_dir, filename)
+        for filename in sorted(os.listdir(log_dir))
+        if filename.endswith(".tracer")
+    )
+    print(f"Covered {_popcount(coverage.union())} of {len(coverage.methods)} methods")
+    print(f"Covered by every trace: {len(coverage.decode(coverage.intersection()))}")
+
+    coverage.save_csv("coverage.csv")
+    coverage.save_json("coverage.json")
+    coverage.diagram_builder().render("UML_Coverage_diagram", formats=("gv", "svg"))
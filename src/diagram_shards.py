@@ -0,0 +1,175 @@
+import html
+import os
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from src.code_analyzer import ClassModel, MethodModel
+from src.diagramm_creater import (
+    DEFAULT_CACHE_DIR,
+    GraphvizDiagramBuilder,
+    Modes,
+    render_dot,
+)
+
+
+# One diagram per directory cluster plus an overview of clusters, so dot
+# lays out several small graphs instead of the whole tree at once
+class ShardedDiagramBuilder:
+    def __init__(self, model: Dict[str, ClassModel], mode: Modes = Modes.CONNECTIONS):
+        self.model = model
+        self.mode = mode
+        self.classes = {
+            name: class_info for name, class_info in model.items() if name != "tracer"
+        }
+        self.tracer = model.get("tracer")
+        self.by_directory: Dict[str, List[ClassModel]] = {}
+        for class_info in self.classes.values():
+            self.by_directory.setdefault(class_info.directory, []).append(class_info)
+        self.shard_names = self._shard_names()
+        # Межкластерные связи раскладываются по директориям один раз
+        self.cross_edges: List[Tuple[str, str]] = []
+        self.edges_by_directory: Dict[str, List[Tuple[str, str]]] = {}
+        for class_from, class_to in self._class_edges():
+            directory_from = self.classes[class_from].directory
+            directory_to = self.classes[class_to].directory
+            if directory_from == directory_to:
+                continue
+            self.cross_edges.append((class_from, class_to))
+            self.edges_by_directory.setdefault(directory_from, []).append((class_from, class_to))
+            self.edges_by_directory.setdefault(directory_to, []).append((class_from, class_to))
+
+    def _shard_names(self) -> Dict[str, str]:
+        names = {}
+        used = set()
+        for directory in self.by_directory:
+            label = GraphvizDiagramBuilder._directory_label(directory).strip("/")
+            base = re.sub(r"\W+", "_", label).strip("_") or "root"
+            name = base
+            index = 1
+            while name in used:
+                index += 1
+                name = f"{base}_{index}"
+            used.add(name)
+            names[directory] = f"shard_{name}"
+        return names
+
+    def _class_edges(self) -> List[Tuple[str, str]]:
+        # Все связи между классами модели: наследование, вызовы или трассировка
+        edges = []
+        for class_info in self.classes.values():
+            for parent in class_info.parents:
+                if parent in self.classes:
+                    edges.append((class_info.name, parent))
+            if self.tracer is None:
+                for method in class_info.methods:
+                    for called_class in method.calls:
+                        if called_class in self.classes:
+                            edges.append((class_info.name, called_class))
+        for connection in self.tracer or []:
+            if connection.class_from in self.classes and connection.class_to in self.classes:
+                edges.append((connection.class_from, connection.class_to))
+        return edges
+
+    def build_shard(self, directory: str, link_format: str = "svg") -> str:
+        own = {class_info.name for class_info in self.by_directory[directory]}
+        shard_model: Dict[str, ClassModel] = {
+            class_info.name: class_info for class_info in self.by_directory[directory]
+        }
+        links = {}
+        # Внешние классы попадают в шард заглушками со ссылкой на свой шард
+        for class_from, class_to in self.edges_by_directory.get(directory, []):
+            external = self.classes[class_to if class_from in own else class_from]
+            if external.name not in shard_model:
+                shard_model[external.name] = ClassModel(
+                    name=external.name,
+                    methods=[MethodModel(name=method.name) for method in external.methods],
+                    directory=external.directory,
+                    filename=external.filename,
+                )
+                links[external.name] = (
+                    f"{self.shard_names[external.directory]}.{link_format}"
+                )
+        if self.tracer is not None:
+            shard_model["tracer"] = [
+                connection
+                for connection in self.tracer
+                if connection.class_from in own or connection.class_to in own
+            ]
+        return GraphvizDiagramBuilder(shard_model, self.mode, links).build_diagram()
+
+    def build_overview(self, link_format: str = "svg") -> str:
+        directory_of = {name: info.directory for name, info in self.classes.items()}
+        cross_edges = Counter(
+            (directory_of[class_from], directory_of[class_to])
+            for class_from, class_to in self.cross_edges
+        )
+        diagram = [
+            "digraph UML_Overview {",
+            "\tgraph [",
+            '\t\tlabel="UML Class diagram overview"',
+            '\t\tlabelloc="t"',
+            '\t\tfontname="Helvetica,Arial,sans-serif"',
+            "\t];",
+            '\tnode [fontname="Helvetica,Arial,sans-serif" shape=box style=filled color=lightgreen];',
+            '\tedge [fontname="Helvetica,Arial,sans-serif"];',
+        ]
+        for directory, classes in self.by_directory.items():
+            label = GraphvizDiagramBuilder._directory_label(directory)
+            diagram.append(
+                f'\t{self.shard_names[directory]} [label="{label}\\n{len(classes)} classes", '
+                f'URL="{self.shard_names[directory]}.{link_format}", target="_top"];'
+            )
+        max_count = max(cross_edges.values(), default=1)
+        for (directory_from, directory_to), count in cross_edges.items():
+            penwidth = 1.0 + 5.0 * count / max_count
+            diagram.append(
+                f"\t{self.shard_names[directory_from]} -> {self.shard_names[directory_to]} "
+                f'[label="{count}", penwidth={penwidth:.2f}];'
+            )
+        diagram.append("}")
+        return "\n".join(diagram)
+
+    def _write_index(self, output_dir: str, fmt: str):
+        rows = "\n".join(
+            f'<li><a href="{self.shard_names[directory]}.{fmt}">'
+            f"{html.escape(GraphvizDiagramBuilder._directory_label(directory))}</a> "
+            f"({len(classes)})</li>"
+            for directory, classes in self.by_directory.items()
+        )
+        index_file = os.path.join(output_dir, "index.html")
+        with open(index_file, "w", encoding="utf-8") as f:
+            f.write(
+                "<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\">"
+                "<title>UML Class diagram</title></head><body>\n"
+                f'<object data="overview.{fmt}" type="image/svg+xml"></object>\n'
+                f"<ul>\n{rows}\n</ul>\n</body></html>\n"
+            )
+        return index_file
+
+    def save(
+        self,
+        output_dir: str = "UML_shards",
+        workers: Optional[int] = None,
+        cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+    ) -> str:
+        # Шарды раскладываются параллельно: время ~ самый большой шард
+        os.makedirs(output_dir, exist_ok=True)
+        jobs = [("overview", self.build_overview())] + [
+            (self.shard_names[directory], self.build_shard(directory))
+            for directory in self.by_directory
+        ]
+        workers = workers or os.cpu_count() or 1
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(
+                executor.map(
+                    lambda job: render_dot(
+                        job[1], os.path.join(output_dir, job[0]), ("svg",), cache_dir
+                    ),
+                    jobs,
+                )
+            )
+        index_file = self._write_index(output_dir, "svg")
+        print(f"UML Class Diagram ({len(jobs) - 1} shards) сохранена в {index_file}")
+        return index_file
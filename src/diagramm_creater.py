@@ -1,13 +1,79 @@
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
-from typing import Dict
+from functools import lru_cache
+import hashlib
+import html
+import math
+from typing import Dict, Iterable, Optional, Tuple
+import graphviz
 from graphviz import Digraph, Source
 from src.code_analyzer import ClassModel, PythonStaticAnalyzer
+from src.layout_budget import LayoutBudget, prune_model
+from src.profiling import profiler
 import os
 
+DEFAULT_CACHE_DIR = ".diagram_cache"
+
+
+@lru_cache(maxsize=1)
+def _graphviz_version() -> str:
+    try:
+        return ".".join(str(part) for part in graphviz.version())
+    except Exception:
+        return "unknown"
+
+
+def _render_format(diagram_text: str, fmt: str, cache_dir: Optional[str]) -> bytes:
+    if fmt in ("gv", "dot"):
+        return diagram_text.encode("utf-8")
+    if not cache_dir:
+        with profiler.stage(f"dot.{fmt}"):
+            return Source(diagram_text).pipe(format=fmt)
+    # Кэш по содержимому: одинаковый DOT-текст повторно не раскладывается
+    key = hashlib.sha256(
+        f"{_graphviz_version()}\0{fmt}\0{diagram_text}".encode("utf-8")
+    ).hexdigest()
+    cached_file = os.path.join(cache_dir, f"{key}.{fmt}")
+    if os.path.exists(cached_file):
+        with open(cached_file, "rb") as f:
+            profiler.count("dot.cache_hits")
+            return f.read()
+    with profiler.stage(f"dot.{fmt}"):
+        data = Source(diagram_text).pipe(format=fmt)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_file = f"{cached_file}.{os.getpid()}.tmp"
+    with open(tmp_file, "wb") as f:
+        f.write(data)
+    os.replace(tmp_file, cached_file)
+    return data
+
+
+def render_dot(
+    diagram_text: str,
+    output_file: str,
+    formats: Iterable[str] = ("png",),
+    cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+) -> Dict[str, str]:
+    # Все форматы из одного DOT-текста, процессы dot запускаются параллельно
+    formats = list(dict.fromkeys(formats))
+    with ThreadPoolExecutor(max_workers=max(1, len(formats))) as executor:
+        results = executor.map(
+            lambda fmt: _render_format(diagram_text, fmt, cache_dir), formats
+        )
+        outputs = {}
+        for fmt, data in zip(formats, results):
+            output_path = f"{output_file}.{fmt}"
+            with open(output_path, "wb") as f:
+                f.write(data)
+            outputs[fmt] = output_path
+    return outputs
+
 
 class Modes(str, Enum):
     TRACER = "tracer"
     CONNECTIONS = "connections"
+    # Трассировка с толщиной и цветом связей по частоте переходов
+    HEATMAP = "heatmap"
 
 
 class GraphvizDiagramBuilder:
@@ -15,14 +81,69 @@ class GraphvizDiagramBuilder:
         self,
         model: Dict[str, ClassModel],
         mode: Modes = Modes.CONNECTIONS,
+        links: Optional[Dict[str, str]] = None,
+        budget: Optional[LayoutBudget] = None,
+        class_colors: Optional[Dict[str, str]] = None,
+        method_colors: Optional[Dict[str, Dict[str, str]]] = None,
+        class_notes: Optional[Dict[str, str]] = None,
+        edge_notes: Optional[Dict[Tuple[str, str, str, str], str]] = None,
     ):
         self.model = model
         self.mode = mode
+        # Бюджет раскладки: важнейшие классы, остальные - в сводные узлы директорий
+        self.budget = budget
+        self.hidden_methods: Dict[str, int] = {}
+        if budget is not None:
+            self.model, self.hidden_methods = prune_model(model, budget)
+        # Ссылки с узлов классов (URL в SVG), например на диаграммы других директорий
+        self.links = links or {}
+        # Подсветка: цвет заголовка класса и строк методов (class -> method -> цвет)
+        self.class_colors = class_colors or {}
+        self.method_colors = method_colors or {}
+        # Аннотации: строка под методами класса и подпись к связям трассировки
+        # (ключ - class_from, method_from, class_to, method_to), например метрики
+        self.class_notes = class_notes or {}
+        self.edge_notes = edge_notes or {}
 
     def _sanitize_node_name(self, name):
         return f"_{name}" if name in "Node" else name
 
+    def _group_by_directory(self) -> Dict[str, list]:
+        # Группировка классов по директориям
+        classes_by_directory = {}
+        for class_name, class_info in self.model.items():
+            if (
+                class_name == "tracer"
+            ):  # Пропускаем 'tracer', чтобы не обрабатывать как ClassModel
+                continue
+            directory = class_info.directory
+            if directory not in classes_by_directory:
+                classes_by_directory[directory] = []
+            classes_by_directory[directory].append(class_info)
+        return classes_by_directory
+
+    def _cluster_name(self, directory: str) -> str:
+        return self._sanitize_node_name(directory.replace("/", "_").replace("-", "_"))
+
+    @staticmethod
+    def _directory_label(directory: str) -> str:
+        return (
+            directory[directory.find("src") - 1 :]
+            if directory.find("src") > 0
+            else directory
+        )
+
     def build_diagram(self):
+        with profiler.stage("build_diagram"):
+            diagram_text = self._build_diagram()
+        if profiler.enabled:
+            profiler.count("diagram.nodes", sum(
+                1 for info in self.model.values() if isinstance(info, ClassModel)
+            ))
+            profiler.count("diagram.dot_bytes", len(diagram_text))
+        return diagram_text
+
+    def _build_diagram(self):
         diagram = [
             "digraph UML_Class_diagram {",
             "\tgraph [",
@@ -39,28 +160,12 @@ class GraphvizDiagramBuilder:
             '\tedge [fontname="Helvetica,Arial,sans-serif"];',
         ]
 
-        # Группировка классов по директориям
-        classes_by_directory = {}
-        for class_name, class_info in self.model.items():
-            if (
-                class_name == "tracer"
-            ):  # Пропускаем 'tracer', чтобы не обрабатывать как ClassModel
-                continue
-            directory = class_info.directory
-            if directory not in classes_by_directory:
-                classes_by_directory[directory] = []
-            classes_by_directory[directory].append(class_info)
+        classes_by_directory = self._group_by_directory()
 
         # Создание подграфов для каждой директории
         for directory, classes in classes_by_directory.items():
-            sanitized_directory_name = self._sanitize_node_name(
-                directory.replace("/", "_").replace("-", "_")
-            )
-            directory_sanitize = (
-                directory[directory.find("src") - 1 :]
-                if directory.find("src") > 0
-                else directory
-            )
+            sanitized_directory_name = self._cluster_name(directory)
+            directory_sanitize = self._directory_label(directory)
             diagram.append(f"subgraph cluster_{sanitized_directory_name} {{")
             diagram.append(f'\tlabel="{directory_sanitize}";')
             diagram.append("\tstyle=filled;")
@@ -68,24 +173,46 @@ class GraphvizDiagramBuilder:
 
             for class_info in classes:
                 sanitized_class_name = self._sanitize_node_name(class_info.name)
+                method_colors = self.method_colors.get(class_info.name, {})
                 methods_rows = "".join(
-                    f'<tr><td align="left" port="{method.name}">+ {method.name}()</td></tr>'
+                    f'<tr><td align="left" port="{method.name}"'
+                    + (
+                        f' bgcolor="{method_colors[method.name]}"'
+                        if method.name in method_colors
+                        else ""
+                    )
+                    + f">+ {method.name}()</td></tr>"
                     for method in class_info.methods
                 )
+                hidden = self.hidden_methods.get(class_info.name)
+                if hidden:
+                    methods_rows += f'<tr><td align="left"><i>+{hidden} more</i></td></tr>'
                 methods_section = (
                     methods_rows if methods_rows else "<tr><td>No methods</td></tr>"
                 )
+                note = self.class_notes.get(class_info.name)
+                if note:
+                    methods_section += f'<tr><td align="left"><i>{html.escape(note)}</i></td></tr>'
+
+                header_color = self.class_colors.get(class_info.name, "lightgray")
                 label = f"""<<table border="2" cellborder="1" cellspacing="0">
-                    <tr><td align="center" bgcolor="lightgray"><b>{class_info.name}</b></td></tr>
+                    <tr><td align="center" bgcolor="{header_color}"><b>{class_info.name}</b></td></tr>
                     <tr><td align="center">{os.path.basename(class_info.filename)}</td></tr>
                     {methods_section}
                 </table>>"""
+                url = (
+                    f', URL="{self.links[class_info.name]}", target="_top"'
+                    if class_info.name in self.links
+                    else ""
+                )
                 diagram.append(
-                    f'\t{sanitized_class_name} [label={label}, style=filled, color="#F0F0F0"];'
+                    f'\t{sanitized_class_name} [label={label}, style=filled, color="#F0F0F0"{url}];'
                 )
 
             diagram.append("}")
 
+        # Счётчик ребер ведётся при выводе: в подписях тоже бывает " -> "
+        edges = 0
         # Добавление связей между классами (наследование и вызовы методов)
         for class_name, class_info in self.model.items():
             if class_name == "tracer":  # Пропускаем 'tracer'
@@ -99,6 +226,7 @@ class GraphvizDiagramBuilder:
                     diagram.append(
                         f'\t{sanitized_class_name} -> {sanitized_parent} [dir="back" arrowtail="empty" style=""];'
                     )
+                    edges += 1
             if not "tracer" in self.model:
                 # Добавляем связи для вызовов методов
                 for method in class_info.methods:
@@ -112,9 +240,14 @@ class GraphvizDiagramBuilder:
                                 f"\t{method_node_name} -> {sanitized_called_class} "
                                 '[color="blue" arrowtail="diamond" arrowhead="normal"];'
                             )
+                            edges += 1
 
         # Добавляем связи от tracer, если они есть
-        if "tracer" in self.model:
+        if "tracer" in self.model and self.mode == Modes.HEATMAP:
+            heatmap_edges = self._heatmap_edges(self.model["tracer"])
+            diagram.extend(heatmap_edges)
+            edges += len(heatmap_edges)
+        elif "tracer" in self.model:
             for index, connection in enumerate(
                 self.model["tracer"], start=1
             ):  # Добавляем индекс для нумерации
@@ -131,14 +264,70 @@ class GraphvizDiagramBuilder:
                     to_node = f"{class_to}:{method_to}" if method_to else class_to
 
                     # Добавляем индекс как метку (label) на стрелке
+                    label = self._edge_label(f"step #{index}", connection)
                     diagram.append(
                         # f'\t{from_node} -> {to_node} [label="step #{index}", color="red" arrowtail="box" arrowhead="normal"];'
-                        f'\t{from_node} -> {to_node} [label="step #{index}", decorate=true, dir="both", color="red" arrowtail="odiamond" arrowhead="normal", constraint=false];'
+                        f'\t{from_node} -> {to_node} [label="{label}", decorate=true, dir="both", color="red" arrowtail="odiamond" arrowhead="normal", constraint=false];'
                     )
+                    edges += 1
 
         diagram.append("}")
+        profiler.count("diagram.edges", edges)
         return "\n".join(diagram)
 
+    def _heatmap_edges(self, connections):
+        max_count = max((max(conn.count, 1) for conn in connections), default=1)
+        edges = []
+        for connection in connections:
+            class_from = self._sanitize_node_name(connection.class_from)
+            class_to = self._sanitize_node_name(connection.class_to)
+            if class_from not in self.model or class_to not in self.model:
+                continue
+            from_node = (
+                f"{class_from}:{connection.method_from}"
+                if connection.method_from
+                else class_from
+            )
+            to_node = (
+                f"{class_to}:{connection.method_to}" if connection.method_to else class_to
+            )
+            count = max(connection.count, 1)
+            # Логарифмическая шкала: от холодного синего к горячему красному
+            heat = math.log(count) / math.log(max_count) if max_count > 1 else 1.0
+            penwidth = 1.0 + 7.0 * heat
+            color = f"{0.66 * (1.0 - heat):.3f} 1.000 0.900"
+            label = self._edge_label(f"x{count} (step #{connection.first_step})", connection)
+            edges.append(
+                f'\t{from_node} -> {to_node} [label="{label}", '
+                f'penwidth={penwidth:.2f}, color="{color}", fontcolor="{color}", '
+                'arrowhead="normal", constraint=false];'
+            )
+        return edges
+
+    def _edge_label(self, label: str, connection) -> str:
+        note = self.edge_notes.get(
+            (
+                connection.class_from,
+                connection.method_from,
+                connection.class_to,
+                connection.method_to,
+            )
+        )
+        return f"{label}\\n{note}" if note else label
+
+    def render(
+        self,
+        output_file="UML_Class_diagram",
+        formats: Iterable[str] = ("gv", "png"),
+        cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+    ) -> Dict[str, str]:
+        # DOT строится один раз для всех запрошенных форматов
+        diagram_text = self.build_diagram()
+        outputs = render_dot(diagram_text, output_file, formats, cache_dir)
+        for output_path in outputs.values():
+            print(f"UML Class Diagram сохранена в {output_path}")
+        return outputs
+
     def save_diagram(self, output_file="UML_Class_diagram.gv"):
         diagram_text = self.build_diagram()
         with open(output_file, "w", encoding="utf-8") as file:
@@ -146,25 +335,13 @@ class GraphvizDiagramBuilder:
         print(f"UML Class Diagram сохранена в {output_file}")
 
     def save_diagram_png(self, output_file="UML_Class_diagram"):
-        diagram_text = self.build_diagram()
-        diagram = Source(diagram_text)
-        diagram.format = "png"
-        diagram.render(filename=output_file, cleanup=True)
-        print(f"UML Class Diagram сохранена в {output_file}.png")
+        self.render(output_file, formats=("png",))
 
     def save_diagram_svg(self, output_file="UML_Class_diagram"):
-        diagram_text = self.build_diagram()
-        diagram = Source(diagram_text)
-        diagram.format = "svg"
-        diagram.render(filename=output_file, cleanup=True)
-        print(f"UML Class Diagram сохранена в {output_file}.svg")
+        self.render(output_file, formats=("svg",))
 
     def save_diagram_pdf(self, output_file="UML_Class_diagram"):
-        diagram_text = self.build_diagram()
-        diagram = Source(diagram_text)
-        diagram.format = "pdf"
-        diagram.render(filename=output_file, cleanup=True)
-        print(f"UML Class Diagram сохранена в {output_file}.pdf")
+        self.render(output_file, formats=("pdf",))
 
 
 # Пример использования с тестовой моделью
@@ -0,0 +1,97 @@
+from typing import Dict, Iterable, List, Optional, Set
+
+from src.code_analyzer import ClassModel, add_missing_parents
+from src.symbol_index import SymbolIndex
+
+
+# Focus diagrams: k-hop neighbourhood of seed classes/methods
+class FocusExtractor:
+    DIRECTIONS = ("in", "out", "both")
+
+    def __init__(self, model: Dict[str, ClassModel], index: Optional[SymbolIndex] = None):
+        self.model = model
+        # Индекс строится один раз и переиспользуется для любых seed
+        self.index = index or SymbolIndex(
+            (info for name, info in model.items() if name != "tracer"),
+            read_imports=False,
+        )
+
+    def _class_neighbours(self, class_id: str, direction: str) -> List[str]:
+        index = self.index
+        neighbours = []
+        if direction in ("out", "both"):
+            neighbours.extend(index.parents.get(class_id, []))
+            neighbours.extend(self._owner(target) for target in index.callees(class_id))
+        if direction in ("in", "both"):
+            neighbours.extend(index.children.get(class_id, []))
+            neighbours.extend(self._owner(source) for source in index.callers(class_id))
+        return neighbours
+
+    def _method_neighbours(self, method_id: str, direction: str) -> List[str]:
+        index = self.index
+        neighbours = []
+        if direction in ("out", "both"):
+            neighbours.extend(self._owner(target) for target in index.forward.get(method_id, []))
+        if direction in ("in", "both"):
+            neighbours.extend(self._owner(source) for source in index.reverse.get(method_id, []))
+        return neighbours
+
+    def _owner(self, node_id: str) -> str:
+        return self.index.class_of_method.get(node_id, node_id)
+
+    def neighbourhood(
+        self, seeds: Iterable[str], hops: int = 1, direction: str = "both"
+    ) -> Set[str]:
+        if direction not in self.DIRECTIONS:
+            raise ValueError(f"Unknown direction {direction!r}, expected one of {self.DIRECTIONS}")
+        visited: Set[str] = set()
+        frontier: List[str] = []
+        for seed in seeds:
+            seed_ids = self.index.lookup(seed)
+            if not seed_ids:
+                print(f"Warning: focus seed {seed} not found in model")
+            for seed_id in seed_ids:
+                visited.add(self._owner(seed_id))
+                frontier.append(seed_id)
+        for _ in range(hops):
+            next_frontier = []
+            for node_id in frontier:
+                # Для метода-seed первый шаг идёт только по его собственным связям
+                if node_id in self.index.class_of_method:
+                    neighbours = self._method_neighbours(node_id, direction)
+                else:
+                    neighbours = self._class_neighbours(node_id, direction)
+                for neighbour in neighbours:
+                    if neighbour not in visited:
+                        visited.add(neighbour)
+                        next_frontier.append(neighbour)
+            frontier = next_frontier
+        return visited
+
+    def extract(
+        self, seeds: Iterable[str], hops: int = 1, direction: str = "both"
+    ) -> Dict[str, ClassModel]:
+        # Подмодель для GraphvizDiagramBuilder: соседи, их родители и связи трассировки
+        seeds = list(seeds)
+        class_ids = self.neighbourhood(seeds, hops, direction)
+        focused: Dict[str, ClassModel] = {}
+        for class_id in sorted(class_ids):
+            class_info = self.index.classes[class_id]
+            focused[class_info.name] = class_info
+        add_missing_parents(focused)
+        if "tracer" in self.model:
+            focused["tracer"] = [
+                connection
+                for connection in self.model["tracer"]
+                if connection.class_from in focused and connection.class_to in focused
+            ]
+        return focused
+
+
+def focus_model(
+    model: Dict[str, ClassModel],
+    seeds: Iterable[str],
+    hops: int = 1,
+    direction: str = "both",
+) -> Dict[str, ClassModel]:
+    return FocusExtractor(model).extract(seeds, hops, direction)
@@ -0,0 +1,257 @@
+import re
+from collections import Counter
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional, Tuple
+
+from src.code_analyzer import ClassModel, MethodModel, TracerConnection
+
+
+@dataclass
+class LayoutBudget:
+    max_nodes: int = 60
+    max_edges: Optional[int] = 200
+    max_methods: Optional[int] = 15
+    # degree - число связей класса, calls - частота вызовов (счётчики трассировки)
+    rank_by: str = "degree"
+
+
+# Сводный узел для всех скрытых классов, если директорий слишком много
+OTHER_DIRECTORY = "other"
+
+
+def _summary_name(directory: str) -> str:
+    return "more_" + (re.sub(r"\W+", "_", directory).strip("_") or "root")
+
+
+def _group_directories(directories, slots: int) -> Dict[str, str]:
+    # Директории скрытых классов сворачиваются в родительские, пока сводных
+    # узлов больше, чем мест; в крайнем случае - один узел "other"
+    parts = {directory: directory.split("/") for directory in directories}
+    depth = max((len(path) for path in parts.values()), default=0)
+    groups = {directory: directory for directory in directories}
+    while len(set(groups.values())) > slots and depth > 1:
+        depth -= 1
+        groups = {directory: "/".join(path[:depth]) for directory, path in parts.items()}
+    if len(set(groups.values())) > slots:
+        groups = dict.fromkeys(directories, OTHER_DIRECTORY)
+    return groups
+
+
+def _rank_classes(
+    classes: Dict[str, ClassModel],
+    tracer: Optional[List[TracerConnection]],
+    rank_by: str,
+) -> Counter:
+    score = Counter({name: 0 for name in classes})
+    for class_info in classes.values():
+        for parent in class_info.parents:
+            if parent in classes:
+                score[class_info.name] += 1
+                score[parent] += 1
+        if tracer is None:
+            for method in class_info.methods:
+                for called_class in method.calls:
+                    if called_class in classes:
+                        if rank_by == "degree":
+                            score[class_info.name] += 1
+                        score[called_class] += 1
+    for connection in tracer or []:
+        weight = max(connection.count, 1) if rank_by == "calls" else 1
+        for name in (connection.class_from, connection.class_to):
+            if name in score:
+                score[name] += weight
+    return score
+
+
+def prune_model(
+    model: Dict[str, ClassModel], budget: LayoutBudget
+) -> Tuple[Dict[str, ClassModel], Dict[str, int]]:
+    # Возвращает урезанную модель и число скрытых методов по классам
+    classes = {name: info for name, info in model.items() if name != "tracer"}
+    tracer = model.get("tracer")
+    score = _rank_classes(classes, tracer, budget.rank_by)
+    ranked = sorted(classes, key=lambda name: (-score[name], name))
+
+    # Резервируем места под сводные узлы директорий, но не больше половины бюджета
+    max_nodes = max(1, budget.max_nodes)
+    limit = max_nodes
+    for _ in range(2):
+        dropped_directories = {classes[name].directory for name in ranked[limit:]}
+        limit = max((max_nodes + 1) // 2, max_nodes - len(dropped_directories))
+    # При max_nodes=1 остаётся только главный класс, без сводного узла
+    if len(ranked) > limit == max_nodes > 1:
+        limit -= 1
+    # Классы + сводные узлы не превышают max_nodes; места, освободившиеся
+    # после объединения директорий, отдаются классам
+    groups = {}
+    if limit < max_nodes:
+        groups = _group_directories(
+            {classes[name].directory for name in ranked[limit:]}, max_nodes - limit
+        )
+    for _ in range(2):
+        wider = max_nodes - max(1, len(set(groups.values())))
+        if wider <= limit or len(ranked) <= limit:
+            break
+        wider_groups = _group_directories(
+            {classes[name].directory for name in ranked[wider:]}, max_nodes - wider
+        )
+        if wider + len(set(wider_groups.values())) > max_nodes:
+            break
+        limit, groups = wider, wider_groups
+    kept = set(ranked[:limit])
+    dropped = Counter(
+        groups[classes[name].directory]
+        for name in ranked[limit:]
+        if classes[name].directory in groups
+    )
+
+    def target(name: str) -> Optional[str]:
+        if name in kept:
+            return name
+        if name in classes and classes[name].directory in groups:
+            return _summary_name(groups[classes[name].directory])
+        return None
+
+    pruned: Dict[str, ClassModel] = {}
+    hidden_methods: Dict[str, int] = {}
+    traced_methods = {
+        (connection.class_from, connection.method_from) for connection in tracer or []
+    } | {(connection.class_to, connection.method_to) for connection in tracer or []}
+
+    for name in [name for name in classes if name in kept]:
+        class_info = classes[name]
+        parents = []
+        for parent in class_info.parents:
+            mapped = target(parent) or parent
+            if mapped not in parents:
+                parents.append(mapped)
+
+        methods = [MethodModel(name=method.name) for method in class_info.methods]
+        if tracer is None:
+            for method, pruned_method in zip(class_info.methods, methods):
+                for called_class in dict.fromkeys(method.calls):
+                    mapped = target(called_class)
+                    if mapped and mapped not in pruned_method.calls:
+                        pruned_method.calls.append(mapped)
+
+        if budget.max_methods is not None and len(methods) > budget.max_methods:
+            # Оставляем методы со связями, остальные сворачиваем в "+N more"
+            important = [
+                method
+                for method in methods
+                if method.calls or (name, method.name) in traced_methods
+            ]
+            keep_names = {method.name for method in important[: budget.max_methods]}
+            for method in methods:
+                if len(keep_names) >= budget.max_methods:
+                    break
+                keep_names.add(method.name)
+            hidden_methods[name] = len(methods) - len(keep_names)
+            methods = [method for method in methods if method.name in keep_names]
+
+        pruned[name] = replace(class_info, methods=methods, parents=parents)
+
+    for directory, count in dropped.items():
+        summary = _summary_name(directory)
+        pruned[summary] = ClassModel(
+            name=summary,
+            directory=directory,
+            filename=f"+{count} more classes",
+        )
+
+    if tracer is not None:
+        pruned["tracer"] = _prune_tracer(tracer, target, pruned)
+    if budget.max_edges is not None:
+        _limit_edges(pruned, score, budget.max_edges)
+    return pruned, hidden_methods
+
+
+def _limit_edges(pruned: Dict[str, ClassModel], score: Counter, max_edges: int):
+    # Наследование, вызовы и переходы трассировки ранжируются вместе:
+    # важность ребра - сумма рангов его концов, у переходов ещё и частота
+    tracer = pruned.get("tracer")
+    edges = []
+    for class_name, class_info in pruned.items():
+        if class_name == "tracer":
+            continue
+        for parent in class_info.parents:
+            if parent in pruned:
+                edges.append(
+                    (score[class_name] + score[parent], 0, ("parent", class_name, parent))
+                )
+        if tracer is None:
+            for method in class_info.methods:
+                for called in method.calls:
+                    key = ("call", class_name, method.name, called)
+                    edges.append((score[class_name] + score[called], 0, key))
+    for position, connection in enumerate(tracer or []):
+        edges.append(
+            (
+                score[connection.class_from] + score[connection.class_to],
+                connection.count,
+                ("tracer", position),
+            )
+        )
+    if len(edges) <= max_edges:
+        return
+    edges.sort(key=lambda edge: (-edge[0], -edge[1]))
+    allowed = {edge[2] for edge in edges[: max(0, max_edges)]}
+
+    for class_name, class_info in pruned.items():
+        if class_name == "tracer":
+            continue
+        class_info.parents = [
+            parent
+            for parent in class_info.parents
+            if parent not in pruned or ("parent", class_name, parent) in allowed
+        ]
+        for method in class_info.methods:
+            method.calls = [
+                called
+                for called in method.calls
+                if ("call", class_name, method.name, called) in allowed
+            ]
+    if tracer is not None:
+        pruned["tracer"] = [
+            connection
+            for position, connection in enumerate(tracer)
+            if ("tracer", position) in allowed
+        ]
+
+
+def _prune_tracer(tracer, target, pruned) -> List[TracerConnection]:
+    # Переходы в скрытые классы и методы сводятся к узлам классов
+    # и сводным узлам с суммарными счётчиками
+    visible = {
+        name: {method.name for method in class_info.methods}
+        for name, class_info in pruned.items()
+    }
+    merged: Dict[Tuple, TracerConnection] = {}
+    for connection in tracer:
+        class_from = target(connection.class_from)
+        class_to = target(connection.class_to)
+        if not class_from or not class_to:
+            continue
+        method_from = (
+            connection.method_from
+            if connection.method_from in visible[class_from]
+            else ""
+        )
+        method_to = (
+            connection.method_to if connection.method_to in visible[class_to] else ""
+        )
+        key = (class_from, method_from, class_to, method_to)
+        merged_connection = merged.get(key)
+        if merged_connection is None:
+            merged[key] = replace(
+                connection,
+                class_from=class_from,
+                method_from=method_from,
+                class_to=class_to,
+                method_to=method_to,
+            )
+        else:
+            merged_connection.count += connection.count
+            merged_connection.first_step = min(merged_connection.first_step, connection.first_step)
+            merged_connection.last_step = max(merged_connection.last_step, connection.last_step)
+    return list(merged.values())
@@ -1,7 +1,14 @@
 import subprocess
+from src.analysis_cache import AnalysisCache
 from src.code_analyzer import PythonStaticAnalyzer
+from src.diagram_shards import ShardedDiagramBuilder
 from src.diagramm_creater import GraphvizDiagramBuilder, Modes
-from src.tracer_analyzer import TracerAnalyzer
+from src.focus import focus_model
+from src.model_diff import save_signatures
+from src.model_store import load_model_binary, save_model_binary
+from src.profiling import profiler
+from src.trace_follower import follow
+from src.trace_store import TraceStore
 
 """
     https://github.com/ivanovai0310/graphviz_test
@@ -11,36 +18,75 @@ from src.tracer_analyzer import TracerAnalyzer
 if __name__ == "__main__":
 
     mode = Modes.TRACER
+    # Процесс, для которого строится трассировка (None - все процессы)
+    trace_pid = None
+    # Следить за растущим логом и перерисовывать диаграмму по мере появления связей
+    follow_log = False
+    # Отдельная диаграмма на каждую директорию + обзор и index.html
+    sharded = False
+    # Ограничение размера диаграммы, например LayoutBudget(max_nodes=60)
+    budget = None
+    # Диаграмма только вокруг выбранных классов/методов, например ["CommandFinder"]
+    focus_seeds = []
+    focus_hops = 2
+    # Готовая модель (anylyzer.umlm) вместо повторного анализа исходников
+    saved_model = None
+    # Замер стадий: profile_report.json + сводка в консоль;
+    # profile_stage - стадия для cProfile (например "analyze.extract.regex"), дамп в <stage>.prof
+    profile = False
+    profile_stage = None
+    if profile:
+        profiler.enable(profile_stage=profile_stage)
     # Analyze the folder and get the model
     analyzer = PythonStaticAnalyzer(
         # "/Users/aleksejivanov/PycharmProjects/nt-core/src/gui"
         # "/Users/aleksejivanov/PycharmProjects/synonym-soft/itb-synonym-core/src/filetransfer"
-        "/Users/aleksejivanov/PycharmProjects/synonym-soft/itb-synonym-core/src"
+        "/Users/aleksejivanov/PycharmProjects/synonym-soft/itb-synonym-core/src",
+        workers=None,
+        cache=AnalysisCache(".analysis_cache.json"),
     )
     # analyzer.generate_test_data()
-    analyzer.analyze()
+    if saved_model:
+        analyzer.model = load_model_binary(saved_model)
+    else:
+        analyzer.analyze()
 
-    if mode == Modes.TRACER:
-        with open("examples/trace.txt", encoding="utf-8") as f:
-            log = f.read()
+    if follow_log:
+        follow("examples/trace.txt", analyzer, mode=mode, pid=trace_pid)
+        raise SystemExit(0)
 
-        tracer_obj = TracerAnalyzer(log)
-        tracers = tracer_obj.parse()
-        analyzer.filter_model_by_tracer(tracers)
+    if mode in (Modes.TRACER, Modes.HEATMAP):
+        # Разобранный лог кэшируется рядом в бинарном виде (examples/trace.txt.tstore)
+        tracers = TraceStore.from_log(
+            "examples/trace.txt", with_pid=True, with_timestamp=True
+        )
+        analyzer.filter_model_by_tracer(tracers, pid=trace_pid)
         pass
 
     analyzer.save_model_to_json("anylyzer.json")
+    save_model_binary(analyzer.get_model(), "anylyzer.umlm")
+    # Сигнатуры классов рядом с моделью - для быстрого ModelDiff
+    save_signatures("anylyzer.umlm", analyzer.get_model())
     model = analyzer.get_model()
+    if focus_seeds:
+        model = focus_model(model, focus_seeds, hops=focus_hops)
 
     # diagram_builder.save_diagram_pdf()
 
+    if sharded:
+        ShardedDiagramBuilder(model, mode).save("UML_shards")
+        raise SystemExit(0)
+
     # Build and render the Graphviz diagram
-    diagram_builder = GraphvizDiagramBuilder(model, mode)
-    diagram_builder.build_diagram()
-    diagram_builder.save_diagram()
-    diagram_builder.save_diagram_png()
+    diagram_builder = GraphvizDiagramBuilder(model, mode, budget=budget)
+    # .gv и .png из одного построения DOT; неизменённые диаграммы берутся из кэша
+    diagram_builder.render("UML_Class_diagram", formats=("gv", "png"))
+
+    if profile:
+        profiler.save_report("profile_report.json")
+        print(profiler.summary())
 
-    # diagram_builder.save_diagram_svg()
+    # diagram_builder.render("UML_Class_diagram", formats=("svg", "pdf"))
 
     # subprocess.run(
     #     ["dot", "-Tpng", "UML_Class_diagram.gv", "-o", "UML_Class_diagram.png"]
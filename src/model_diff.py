@@ -0,0 +1,338 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field, replace
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from src.code_analyzer import (
+    ClassModel,
+    MethodModel,
+    TracerConnection,
+    TracerEdgeCounter,
+    load_model_json,
+)
+from src.diagramm_creater import GraphvizDiagramBuilder, Modes
+from src.model_store import load_model_binary
+from src.path_index import TraceAttributor
+from src.tracer_analyzer import Tracer
+
+ADDED_COLOR = "#B8E6B8"
+REMOVED_COLOR = "#F4B6B6"
+CHANGED_COLOR = "#F8E7A1"
+
+EdgeKey = Tuple[str, str, str, str]
+
+
+def _static_calls(calls) -> List[str]:
+    return sorted(call for call in calls if isinstance(call, str))
+
+
+def class_signature(class_info: ClassModel) -> str:
+    # Порядок методов и вызовов не важен - сигнатура от отсортированных данных
+    data = [
+        class_info.directory,
+        class_info.filename,
+        sorted(class_info.parents),
+        _static_calls(class_info.calls),
+        sorted((method.name, sorted(method.calls)) for method in class_info.methods),
+    ]
+    return hashlib.sha1(
+        json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    ).hexdigest()
+
+
+def _edge_key(connection: TracerConnection) -> EdgeKey:
+    return (
+        connection.class_from,
+        connection.method_from,
+        connection.class_to,
+        connection.method_to,
+    )
+
+
+# Model of changes inside one class
+@dataclass
+class ClassChange:
+    name: str
+    added_methods: List[str] = field(default_factory=list)
+    removed_methods: List[str] = field(default_factory=list)
+    # метод -> (добавленные вызовы, удалённые вызовы)
+    changed_methods: Dict[str, Tuple[List[str], List[str]]] = field(default_factory=dict)
+    added_parents: List[str] = field(default_factory=list)
+    removed_parents: List[str] = field(default_factory=list)
+    moved: bool = False
+
+
+# Разница двух снимков модели: классы с одинаковой сигнатурой пропускаются
+# без разбора, подробно сравниваются только классы с разными хэшами
+class ModelDiff:
+    def __init__(
+        self,
+        old: Dict[str, ClassModel],
+        new: Dict[str, ClassModel],
+        old_signatures: Optional[Dict[str, str]] = None,
+        new_signatures: Optional[Dict[str, str]] = None,
+    ):
+        self.old = old
+        self.new = new
+        # Готовые сигнатуры (из файла рядом с моделью) избавляют от хэширования
+        old_signatures = old_signatures if old_signatures is not None else signatures_of(old)
+        new_signatures = new_signatures if new_signatures is not None else signatures_of(new)
+        self.added_classes = [name for name in new_signatures if name not in old_signatures]
+        self.removed_classes = [name for name in old_signatures if name not in new_signatures]
+        self.changed_classes: Dict[str, ClassChange] = {}
+        self.unchanged = 0
+        for name, signature in new_signatures.items():
+            if name not in old_signatures:
+                continue
+            if old_signatures[name] == signature:
+                self.unchanged += 1
+                continue
+            self.changed_classes[name] = self._compare_class(old[name], new[name])
+
+        old_edges = {_edge_key(conn): conn for conn in old.get("tracer") or []}
+        new_edges = {_edge_key(conn): conn for conn in new.get("tracer") or []}
+        self.added_edges = [new_edges[key] for key in new_edges if key not in old_edges]
+        self.removed_edges = [old_edges[key] for key in old_edges if key not in new_edges]
+        # Связь есть в обоих снимках, но частота переходов изменилась
+        self.changed_edges: Dict[EdgeKey, Tuple[int, int]] = {
+            key: (old_edges[key].count, conn.count)
+            for key, conn in new_edges.items()
+            if key in old_edges and old_edges[key].count != conn.count
+        }
+
+    @staticmethod
+    def _compare_class(old: ClassModel, new: ClassModel) -> ClassChange:
+        change = ClassChange(name=new.name)
+        old_methods = {method.name: method for method in old.methods}
+        new_methods = {method.name: method for method in new.methods}
+        change.added_methods = [name for name in new_methods if name not in old_methods]
+        change.removed_methods = [name for name in old_methods if name not in new_methods]
+        for name, method in new_methods.items():
+            if name not in old_methods:
+                continue
+            old_calls, new_calls = set(old_methods[name].calls), set(method.calls)
+            if old_calls != new_calls:
+                change.changed_methods[name] = (
+                    sorted(new_calls - old_calls),
+                    sorted(old_calls - new_calls),
+                )
+        change.added_parents = [parent for parent in new.parents if parent not in old.parents]
+        change.removed_parents = [parent for parent in old.parents if parent not in new.parents]
+        change.moved = (old.directory, old.filename) != (new.directory, new.filename)
+        return change
+
+    @classmethod
+    def from_files(cls, old_path: str, new_path: str) -> "ModelDiff":
+        old, new = load_model(old_path), load_model(new_path)
+        return cls(old, new, load_signatures(old_path), load_signatures(new_path))
+
+    @classmethod
+    def from_traces(
+        cls,
+        old_tracers: Iterable[Tracer],
+        new_tracers: Iterable[Tracer],
+        pid: Optional[int] = None,
+        model: Optional[Dict[str, ClassModel]] = None,
+    ) -> "ModelDiff":
+        # Сравнение только наборов переходов двух трасс; классы статической
+        # модели (одинаковые в обоих снимках) нужны, чтобы нарисовать связи
+        classes = {
+            name: info for name, info in (model or {}).items() if isinstance(info, ClassModel)
+        }
+        models = []
+        for tracers in (old_tracers, new_tracers):
+            counter = TracerEdgeCounter(pid)
+            # События "Entering function" получают класс по пути файла
+            counter.add_all(TraceAttributor(classes).attribute_all(tracers))
+            models.append({**classes, "tracer": counter.connections()})
+        signatures = signatures_of(classes)
+        return cls(*models, signatures, signatures)
+
+    def is_empty(self) -> bool:
+        return not (
+            self.added_classes
+            or self.removed_classes
+            or self.changed_classes
+            or self.added_edges
+            or self.removed_edges
+            or self.changed_edges
+        )
+
+    def summary(self) -> Dict[str, object]:
+        return {
+            "unchanged_classes": self.unchanged,
+            "added_classes": self.added_classes,
+            "removed_classes": self.removed_classes,
+            "changed_classes": {
+                name: {
+                    "added_methods": change.added_methods,
+                    "removed_methods": change.removed_methods,
+                    "changed_methods": {
+                        method: {"added_calls": added, "removed_calls": removed}
+                        for method, (added, removed) in change.changed_methods.items()
+                    },
+                    "added_parents": change.added_parents,
+                    "removed_parents": change.removed_parents,
+                    "moved": change.moved,
+                }
+                for name, change in self.changed_classes.items()
+            },
+            "added_edges": [list(_edge_key(conn)) for conn in self.added_edges],
+            "removed_edges": [list(_edge_key(conn)) for conn in self.removed_edges],
+            "changed_edges": [
+                {"edge": list(key), "old_count": old, "new_count": new}
+                for key, (old, new) in self.changed_edges.items()
+            ],
+        }
+
+    def save_json(self, output_file: str):
+        with open(output_file, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=4, ensure_ascii=False)
+
+    def _context(self, names: Set[str]) -> Set[str]:
+        # Один шаг окружения: родители и вызываемые классы изменённых классов.
+        # Смежность строится только по ним - неизменённые классы не читаются
+        context = set()
+        for model in (self.old, self.new):
+            for name in names:
+                info = model.get(name)
+                if not isinstance(info, ClassModel):
+                    continue
+                context.update(info.parents)
+                for method in info.methods:
+                    context.update(method.calls)
+        return {name for name in context if name in self.old or name in self.new} - names
+
+    def diff_model(self):
+        # Подмодель только с изменениями и одним шагом окружения + цвета для builder
+        changed = set(self.added_classes) | set(self.removed_classes) | set(self.changed_classes)
+        for connection in self.added_edges + self.removed_edges:
+            changed.update((connection.class_from, connection.class_to))
+        for class_from, _, class_to, _ in self.changed_edges:
+            changed.update((class_from, class_to))
+        changed = {name for name in changed if name in self.new or name in self.old}
+        names = changed | self._context(changed)
+
+        model: Dict[str, ClassModel] = {}
+        class_colors: Dict[str, str] = {}
+        method_colors: Dict[str, Dict[str, str]] = {}
+        for name in sorted(names):
+            info = self.new.get(name)
+            if not isinstance(info, ClassModel):
+                info = self.old.get(name)
+                if not isinstance(info, ClassModel):
+                    continue
+            change = self.changed_classes.get(name)
+            if change is not None and change.removed_methods:
+                # Удалённые методы остаются на диаграмме, чтобы их можно было подсветить
+                removed = [
+                    method
+                    for method in self.old[name].methods
+                    if method.name in change.removed_methods
+                ]
+                info = replace(
+                    info,
+                    methods=info.methods + [MethodModel(method.name, []) for method in removed],
+                )
+            model[name] = info
+
+            if name in self.added_classes:
+                class_colors[name] = ADDED_COLOR
+            elif name in self.removed_classes:
+                class_colors[name] = REMOVED_COLOR
+            elif change is not None:
+                class_colors[name] = CHANGED_COLOR
+                colors = method_colors.setdefault(name, {})
+                colors.update(dict.fromkeys(change.added_methods, ADDED_COLOR))
+                colors.update(dict.fromkeys(change.removed_methods, REMOVED_COLOR))
+                colors.update(dict.fromkeys(change.changed_methods, CHANGED_COLOR))
+
+        edge_notes: Dict[EdgeKey, str] = {}
+        tracer = []
+        for connection in self.added_edges:
+            tracer.append(connection)
+            edge_notes[_edge_key(connection)] = "added"
+        for connection in self.removed_edges:
+            tracer.append(connection)
+            edge_notes[_edge_key(connection)] = "removed"
+        for key, (old, new) in self.changed_edges.items():
+            tracer.append(TracerConnection(*key, count=new))
+            edge_notes[key] = f"x{old} -> x{new}"
+        if tracer:
+            model["tracer"] = tracer
+        return model, class_colors, method_colors, edge_notes
+
+    def diagram_builder(self, mode: Optional[Modes] = None) -> GraphvizDiagramBuilder:
+        # CONNECTIONS - статические вызовы, TRACER/HEATMAP - изменённые переходы
+        # трассировки; по умолчанию TRACER, только если переходы изменились
+        model, class_colors, method_colors, edge_notes = self.diff_model()
+        if mode is None:
+            has_edges = self.added_edges or self.removed_edges or self.changed_edges
+            mode = Modes.TRACER if has_edges else Modes.CONNECTIONS
+        if mode == Modes.CONNECTIONS:
+            model.pop("tracer", None)
+        else:
+            model.setdefault("tracer", [])
+        return GraphvizDiagramBuilder(
+            model,
+            mode,
+            class_colors=class_colors,
+            method_colors=method_colors,
+            edge_notes=edge_notes,
+        )
+
+
+def signatures_of(model: Dict[str, ClassModel]) -> Dict[str, str]:
+    return {
+        name: class_signature(info)
+        for name, info in model.items()
+        if isinstance(info, ClassModel)
+    }
+
+
+def signatures_file(filepath: str) -> str:
+    return filepath + ".sig.json"
+
+
+def save_signatures(filepath: str, model: Dict[str, ClassModel]):
+    # Вызывается там, где сохраняется модель; ModelDiff только читает файл
+    stat = os.stat(filepath)
+    sig_file = signatures_file(filepath)
+    with open(sig_file, "w", encoding="utf-8") as f:
+        json.dump(
+            {"model": [stat.st_mtime_ns, stat.st_size], "signatures": signatures_of(model)},
+            f,
+            ensure_ascii=False,
+        )
+
+
+def load_signatures(filepath: str) -> Optional[Dict[str, str]]:
+    # Сигнатуры из <model>.sig.json, если он записан для этой версии файла модели
+    stat = os.stat(filepath)
+    try:
+        with open(signatures_file(filepath), encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("model") == [stat.st_mtime_ns, stat.st_size]:
+            return data["signatures"]
+    except (OSError, ValueError, KeyError, AttributeError):
+        pass
+    return None
+
+
+def load_model(filepath: str) -> Dict[str, ClassModel]:
+    # anylyzer.json или бинарная anylyzer.umlm
+    if os.path.splitext(filepath)[1] == ".json":
+        return load_model_json(filepath)
+    return load_model_binary(filepath)
+
+
+if __name__ == "__main__":
+    diff = ModelDiff.from_files("anylyzer_before.umlm", "anylyzer.umlm")
+    print(
+        f"unchanged {diff.unchanged}, added {len(diff.added_classes)}, "
+        f"removed {len(diff.removed_classes)}, changed {len(diff.changed_classes)}"
+    )
+    diff.save_json("model_diff.json")
+    if not diff.is_empty():
+        diff.diagram_builder().render("UML_Diff_diagram", formats=("gv", "svg"))
@@ -0,0 +1,293 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import MutableMapping
+from itertools import accumulate
+from typing import Dict, Iterator, List, Tuple
+
+from src.code_analyzer import ClassModel, MethodModel, TracerConnection
+
+# Compact binary model: interned strings, fixed-size class index and uint32
+# class records that are decoded lazily on access
+#
+# header | string lengths | string bytes | class index | tracer | class records
+MAGIC = b"UMLMODEL"
+# 2: в записях классов и методов есть строки начала/конца; версия 1 читается
+# 3: флаги в заголовке (ключ "tracer" есть даже при пустом списке связей)
+VERSION = 3
+READABLE_VERSIONS = (1, 2, 3)
+HEADER = struct.Struct("<8sIIIII")  # magic, version, strings, classes, tracer, flags
+HEADER_V2 = struct.Struct("<8sIIII")  # версии 1-2: без флагов
+FLAG_TRACER = 1
+INDEX_ENTRY = struct.Struct("<IQI")  # name id, record offset, record size
+TRACER_ENTRY = struct.Struct("<8I")
+
+
+def _to_bytes(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_bytes(typecode: str, data) -> array:
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+class _StringTable:
+    def __init__(self):
+        self.strings: List[str] = []
+        self.ids: Dict[str, int] = {}
+
+    def intern(self, value: str) -> int:
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = len(self.strings)
+            self.strings.append(value)
+            self.ids[value] = string_id
+        return string_id
+
+
+def _encode_class(class_model: ClassModel, strings: _StringTable) -> bytes:
+    record = array("I")
+    record.append(strings.intern(class_model.directory))
+    record.append(strings.intern(class_model.filename))
+    record.append(class_model.lineno)
+    record.append(class_model.end_lineno)
+    record.append(len(class_model.parents))
+    record.extend(strings.intern(parent) for parent in class_model.parents)
+    calls = [call for call in class_model.calls if isinstance(call, str)]
+    record.append(len(calls))
+    record.extend(strings.intern(call) for call in calls)
+    record.append(len(class_model.methods))
+    for method in class_model.methods:
+        record.append(strings.intern(method.name))
+        record.append(method.lineno)
+        record.append(method.end_lineno)
+        record.append(len(method.calls))
+        record.extend(strings.intern(call) for call in method.calls)
+    return _to_bytes(record)
+
+
+def save_model_binary(model, filepath: str):
+    strings = _StringTable()
+    records: List[Tuple[int, bytes]] = []
+    for class_name, class_model in model.items():
+        if isinstance(class_model, ClassModel):
+            records.append((strings.intern(class_name), _encode_class(class_model, strings)))
+
+    flags = FLAG_TRACER if "tracer" in model else 0
+    tracer = model.get("tracer") or []
+    tracer_block = b"".join(
+        TRACER_ENTRY.pack(
+            strings.intern(conn.class_from or ""),
+            strings.intern(conn.method_from or ""),
+            strings.intern(conn.class_to or ""),
+            strings.intern(conn.method_to or ""),
+            conn.count,
+            conn.first_step,
+            conn.last_step,
+            conn.callers,
+        )
+        for conn in tracer
+    )
+
+    encoded = [value.encode("utf-8") for value in strings.strings]
+    lengths = _to_bytes(array("I", (len(value) for value in encoded)))
+    string_bytes = b"".join(encoded)
+
+    offset = (
+        HEADER.size
+        + len(lengths)
+        + len(string_bytes)
+        + INDEX_ENTRY.size * len(records)
+        + len(tracer_block)
+    )
+    index = []
+    for name_id, record in records:
+        index.append(INDEX_ENTRY.pack(name_id, offset, len(record)))
+        offset += len(record)
+
+    tmp_path = f"{filepath}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(encoded), len(records), len(tracer), flags))
+        f.write(lengths)
+        f.write(string_bytes)
+        f.write(b"".join(index))
+        f.write(tracer_block)
+        for _, record in records:
+            f.write(record)
+    os.replace(tmp_path, filepath)
+
+
+# Read-only mmap view of a saved model; classes are decoded on first access.
+# Assignments (e.g. from _add_missing_parents) stay in memory.
+class LazyModel(MutableMapping):
+    def __init__(self, filepath: str):
+        with open(filepath, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, string_count, class_count, tracer_count = HEADER_V2.unpack_from(
+            self._mmap, 0
+        )
+        if magic != MAGIC or version not in READABLE_VERSIONS:
+            self._mmap.close()
+            raise ValueError(f"{filepath} is not a binary model (version {VERSION})")
+        self._version = version
+        if version >= 3:
+            flags = HEADER.unpack_from(self._mmap, 0)[5]
+            offset = HEADER.size
+        else:
+            flags = FLAG_TRACER if tracer_count else 0
+            offset = HEADER_V2.size
+
+        lengths = _from_bytes("I", self._mmap[offset : offset + 4 * string_count])
+        offset += 4 * string_count
+        self._string_offsets = array("Q", accumulate(lengths, initial=offset))
+        self._strings: Dict[int, str] = {}
+        offset = self._string_offsets[-1]
+
+        self._index: Dict[str, Tuple[int, int]] = {}
+        for _ in range(class_count):
+            name_id, record_offset, size = INDEX_ENTRY.unpack_from(self._mmap, offset)
+            self._index[self._string(name_id)] = (record_offset, size)
+            offset += INDEX_ENTRY.size
+        self._tracer_span = (offset, tracer_count)
+        self._loaded: Dict[str, object] = {}
+        self._order: Dict[str, None] = dict.fromkeys(self._index)
+        if flags & FLAG_TRACER:
+            self._order["tracer"] = None
+
+    def _string(self, string_id: int) -> str:
+        value = self._strings.get(string_id)
+        if value is None:
+            start, end = self._string_offsets[string_id], self._string_offsets[string_id + 1]
+            value = self._mmap[start:end].decode("utf-8")
+            self._strings[string_id] = value
+        return value
+
+    def _decode_class(self, name: str) -> ClassModel:
+        offset, size = self._index[name]
+        record = _from_bytes("I", self._mmap[offset : offset + size])
+        string = self._string
+        position = 0
+
+        def take(count: int) -> List[str]:
+            nonlocal position
+            values = [string(value) for value in record[position : position + count]]
+            position += count
+            return values
+
+        directory, filename = take(2)
+        lineno = end_lineno = 0
+        if self._version >= 2:
+            lineno, end_lineno = record[position], record[position + 1]
+            position += 2
+        parent_count = record[position]
+        position += 1
+        parents = take(parent_count)
+        call_count = record[position]
+        position += 1
+        calls = take(call_count)
+        method_count = record[position]
+        position += 1
+        methods = []
+        for _ in range(method_count):
+            method_name = string(record[position])
+            position += 1
+            method_lineno = method_end_lineno = 0
+            if self._version >= 2:
+                method_lineno, method_end_lineno = record[position], record[position + 1]
+                position += 2
+            method_call_count = record[position]
+            position += 1
+            methods.append(
+                MethodModel(
+                    name=method_name,
+                    calls=take(method_call_count),
+                    lineno=method_lineno,
+                    end_lineno=method_end_lineno,
+                )
+            )
+        return ClassModel(
+            name=name,
+            methods=methods,
+            parents=parents,
+            calls=calls,
+            directory=directory,
+            filename=filename,
+            lineno=lineno,
+            end_lineno=end_lineno,
+        )
+
+    def _decode_tracer(self) -> List[TracerConnection]:
+        offset, count = self._tracer_span
+        connections = []
+        for index in range(count):
+            values = TRACER_ENTRY.unpack_from(self._mmap, offset + index * TRACER_ENTRY.size)
+            connections.append(
+                TracerConnection(
+                    class_from=self._string(values[0]),
+                    method_from=self._string(values[1]),
+                    class_to=self._string(values[2]),
+                    method_to=self._string(values[3]),
+                    count=values[4],
+                    first_step=values[5],
+                    last_step=values[6],
+                    callers=values[7],
+                )
+            )
+        return connections
+
+    def __getitem__(self, name: str):
+        value = self._loaded.get(name)
+        if value is not None:
+            return value
+        if name == "tracer" and name in self._order:
+            value = self._decode_tracer()
+        elif name in self._index:
+            value = self._decode_class(name)
+        else:
+            raise KeyError(name)
+        self._loaded[name] = value
+        return value
+
+    def __setitem__(self, name: str, value):
+        self._loaded[name] = value
+        self._order[name] = None
+
+    def __delitem__(self, name: str):
+        if name not in self._order:
+            raise KeyError(name)
+        del self._order[name]
+        self._loaded.pop(name, None)
+        self._index.pop(name, None)
+
+    def __contains__(self, name) -> bool:
+        return name in self._order
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._order))
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def copy(self) -> Dict[str, object]:
+        return dict(self.items())
+
+    def close(self):
+        self._mmap.close()
+
+
+def load_model_binary(filepath: str, lazy: bool = True):
+    model = LazyModel(filepath)
+    if lazy:
+        return model
+    loaded = model.copy()
+    model.close()
+    return loaded
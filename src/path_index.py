@@ -0,0 +1,105 @@
+import os
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.code_analyzer import ClassModel
+from src.tracer_analyzer import EVENT_EXCEPTION, EVENT_FUNCTION, Tracer
+
+# Сколько последних компонентов пути участвуют в сопоставлении
+MAX_SUFFIX = 8
+
+
+def _path_parts(path: str) -> Tuple[str, ...]:
+    return tuple(
+        part for part in path.replace("\\", "/").split("/") if part and part != "."
+    )
+
+
+# Индекс суффиксов путей: "opt/.../site-packages/syn_shell/command_tree/finder.py"
+# сопоставляется с файлом модели по самому длинному общему хвосту пути
+class SourcePathIndex:
+    def __init__(self, model: Dict[str, ClassModel]):
+        # файл модели -> {метод -> класс}
+        self.methods_by_file: Dict[Tuple[str, ...], Dict[str, str]] = {}
+        # хвост пути -> файлы модели с таким хвостом
+        self.suffixes: Dict[Tuple[str, ...], List[Tuple[str, ...]]] = {}
+        # метод -> классы, где он объявлен (для исключений без пути)
+        self.classes_by_method: Dict[str, List[str]] = {}
+        self._resolved: Dict[str, Optional[Tuple[str, ...]]] = {}
+
+        for class_name, class_info in model.items():
+            if not isinstance(class_info, ClassModel):
+                continue
+            parts = _path_parts(os.path.join(class_info.directory, class_info.filename))
+            methods = self.methods_by_file.get(parts)
+            if methods is None:
+                methods = self.methods_by_file[parts] = {}
+                for length in range(1, min(len(parts), MAX_SUFFIX) + 1):
+                    self.suffixes.setdefault(parts[-length:], []).append(parts)
+            for method in class_info.methods:
+                methods.setdefault(method.name, class_name)
+                self.classes_by_method.setdefault(method.name, []).append(class_name)
+
+    def resolve_file(self, path: str) -> Optional[Tuple[str, ...]]:
+        # Пути в трассе повторяются, поэтому результат запоминается
+        if path in self._resolved:
+            return self._resolved[path]
+        parts = _path_parts(path)
+        resolved = None
+        for length in range(min(len(parts), MAX_SUFFIX), 0, -1):
+            files = self.suffixes.get(parts[-length:])
+            if files:
+                # Неоднозначный хвост (одинаковые имена файлов) не сопоставляется
+                resolved = files[0] if len(files) == 1 else None
+                break
+        self._resolved[path] = resolved
+        return resolved
+
+    def class_of_function(self, path: str, function: str) -> Optional[str]:
+        file_parts = self.resolve_file(path)
+        if file_parts is None:
+            return None
+        return self.methods_by_file[file_parts].get(function)
+
+    def class_of_method(self, method_name: str) -> Optional[str]:
+        classes = self.classes_by_method.get(method_name)
+        return classes[0] if classes and len(classes) == 1 else None
+
+
+# Проставляет class_name событиям "Entering function" и "Exception in".
+# Исключение относится к классу предыдущего события того же процесса, если
+# там тот же метод, иначе - к единственному классу с таким методом.
+class TraceAttributor:
+    def __init__(self, model: Dict[str, ClassModel], index: Optional[SourcePathIndex] = None):
+        self.index = index or SourcePathIndex(model)
+        self._last: Dict[Optional[int], Tracer] = {}
+        self.attributed = 0
+        self.unattributed = 0
+
+    def attribute(self, tracer: Tracer) -> Tracer:
+        if tracer.class_name is None and tracer.method_name:
+            if tracer.event == EVENT_FUNCTION:
+                tracer.class_name = self.index.class_of_function(
+                    tracer.file_path, tracer.method_name
+                )
+            elif tracer.event == EVENT_EXCEPTION:
+                previous = self._last.get(tracer.pid)
+                if previous is not None and previous.method_name == tracer.method_name:
+                    tracer.class_name = previous.class_name
+                else:
+                    tracer.class_name = self.index.class_of_method(tracer.method_name)
+            if tracer.class_name:
+                self.attributed += 1
+            else:
+                self.unattributed += 1
+        if tracer.event != EVENT_EXCEPTION:
+            self._last[tracer.pid] = tracer
+        return tracer
+
+    def attribute_all(self, tracers: Iterable[Tracer]) -> Iterator[Tracer]:
+        # Объекты Tracer дополняются на месте, поток остаётся ленивым
+        for tracer in tracers:
+            yield self.attribute(tracer)
+
+
+def attribute_tracers(model: Dict[str, ClassModel], tracers: Iterable[Tracer]) -> Iterator[Tracer]:
+    return TraceAttributor(model).attribute_all(tracers)
@@ -0,0 +1,251 @@
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from src.code_analyzer import ClassModel
+from src.path_index import TraceAttributor
+from src.tracer_analyzer import EVENT_EXCEPTION, Tracer, TracerAnalyzer, _iter_lines
+
+MethodKey = Tuple[str, str]
+EdgeKey = Tuple[str, str, str, str]
+
+
+# Model of one "Performance Report" block
+@dataclass
+class PerfSample:
+    timestamp: Optional[float] = None
+    host: Optional[str] = None
+    pid: Optional[int] = None
+    rss_mb: Optional[float] = None
+    load_1: Optional[float] = None
+    load_5: Optional[float] = None
+    load_15: Optional[float] = None
+    memory_total_mb: Optional[float] = None
+    memory_used_mb: Optional[float] = None
+    memory_available_mb: Optional[float] = None
+    disk_total_gb: Optional[float] = None
+    disk_free_gb: Optional[float] = None
+
+
+REPORT_START = "Performance Report"
+REPORT_FIELDS = [
+    (re.compile(r"Global memory usage \(RSS\): ([\d.]+) MB"), ("rss_mb",)),
+    (
+        re.compile(r"CPU load averages \(1min, 5min, 15min\): ([\d.]+)%, ([\d.]+)%, ([\d.]+)%"),
+        ("load_1", "load_5", "load_15"),
+    ),
+    (re.compile(r"System total memory: ([\d.]+) MB"), ("memory_total_mb",)),
+    (re.compile(r"System used memory: ([\d.]+) MB"), ("memory_used_mb",)),
+    (re.compile(r"System available memory: ([\d.]+) MB"), ("memory_available_mb",)),
+    (re.compile(r"Total disk space: ([\d.]+) GB"), ("disk_total_gb",)),
+    (re.compile(r"Free disk space: ([\d.]+) GB"), ("disk_free_gb",)),
+]
+# Строка из одних звёздочек закрывает блок
+REPORT_END = re.compile(r" - \*+\s*$")
+
+
+# Собирает блоки отчёта из строк лога; блоки разных процессов не смешиваются
+class PerfReportParser:
+    def __init__(self):
+        self.analyzer = TracerAnalyzer()
+        self._open: Dict[Tuple, PerfSample] = {}
+
+    def feed(self, line: str, header: Optional[Tracer] = None) -> Optional[PerfSample]:
+        # header - уже разобранный Tracer этой строки (timestamp, host, pid)
+        if header is None:
+            header = Tracer(raw_text="")
+            self.analyzer._parse_header(line, header)
+        key = (header.host, header.pid)
+        if REPORT_START in line:
+            self._open[key] = PerfSample(
+                timestamp=header.timestamp, host=header.host, pid=header.pid
+            )
+            return None
+        sample = self._open.get(key)
+        if sample is None:
+            return None
+        if REPORT_END.search(line):
+            return self._open.pop(key)
+        for pattern, fields in REPORT_FIELDS:
+            match = pattern.search(line)
+            if match:
+                for field_name, value in zip(fields, match.groups()):
+                    setattr(sample, field_name, float(value))
+                break
+        return None
+
+
+def iter_events_and_samples(
+    source: Union[str, Iterable[str]], keep_raw: bool = False
+) -> Iterator[Union[Tracer, PerfSample]]:
+    # Один проход по логу: события трассы и отчёты в порядке следования строк
+    analyzer = TracerAnalyzer()
+    reports = PerfReportParser()
+    for line in _iter_lines(source):
+        line = line.rstrip("\r\n")
+        tracer = analyzer.parse_line(line, keep_raw)
+        if tracer.event:
+            yield tracer
+            continue
+        sample = reports.feed(line, tracer)
+        if sample is not None:
+            yield sample
+
+
+def read_samples(source: Union[str, Iterable[str]]) -> List[PerfSample]:
+    return [item for item in iter_events_and_samples(source) if isinstance(item, PerfSample)]
+
+
+class _Interval:
+    def __init__(self, sample: PerfSample):
+        self.start = sample
+        # События по pid: отчёт относится к своему процессу, если тот трассируется
+        self.methods: Dict[Optional[int], Counter] = {}
+        self.edges: Dict[Optional[int], Counter] = {}
+
+
+# Метрики между соседними отчётами (прирост RSS, загрузка CPU) приписываются
+# классам, методам и переходам, которые выполнялись в этом интервале.
+# Прирост RSS делится пропорционально числу событий, загрузка - максимум.
+class MetricsOverlay:
+    def __init__(self, model: Optional[Dict[str, ClassModel]] = None):
+        self.attributor = TraceAttributor(model) if model is not None else None
+        self.samples: List[PerfSample] = []
+        self.intervals: List[Dict] = []
+        self.class_metrics: Dict[str, Dict[str, float]] = {}
+        self.method_metrics: Dict[MethodKey, Dict[str, float]] = {}
+        self.edge_metrics: Dict[EdgeKey, Dict[str, float]] = {}
+        self._open: Dict[Tuple, _Interval] = {}
+        self._previous: Dict[Optional[int], MethodKey] = {}
+
+    def add_event(self, tracer: Tracer):
+        if self.attributor is not None:
+            self.attributor.attribute(tracer)
+        if not tracer.class_name or tracer.event == EVENT_EXCEPTION:
+            return
+        point = (tracer.class_name, tracer.method_name)
+        previous = self._previous.get(tracer.pid)
+        self._previous[tracer.pid] = point
+        for interval in self._open.values():
+            interval.methods.setdefault(tracer.pid, Counter())[point] += 1
+            if previous is not None and previous != point:
+                interval.edges.setdefault(tracer.pid, Counter())[previous + point] += 1
+
+    def add_sample(self, sample: PerfSample):
+        self.samples.append(sample)
+        key = (sample.host, sample.pid)
+        interval = self._open.get(key)
+        if interval is not None:
+            self._close(interval, sample)
+        self._open[key] = _Interval(sample)
+
+    def feed(self, items: Iterable[Union[Tracer, PerfSample]]) -> "MetricsOverlay":
+        for item in items:
+            if isinstance(item, PerfSample):
+                self.add_sample(item)
+            else:
+                self.add_event(item)
+        return self
+
+    @staticmethod
+    def _select(per_pid: Dict[Optional[int], Counter], pid: Optional[int]) -> Counter:
+        if pid in per_pid:
+            return per_pid[pid]
+        # Отчёт пишет отдельный процесс-монитор: метрики общие для всех процессов
+        merged = Counter()
+        for counter in per_pid.values():
+            merged.update(counter)
+        return merged
+
+    def _close(self, interval: _Interval, end: PerfSample):
+        start = interval.start
+        rss_delta = (
+            end.rss_mb - start.rss_mb
+            if end.rss_mb is not None and start.rss_mb is not None
+            else 0.0
+        )
+        load = end.load_1 or 0.0
+        methods = self._select(interval.methods, end.pid)
+        edges = self._select(interval.edges, end.pid)
+        total = sum(methods.values())
+        self.intervals.append(
+            {
+                "start": start.timestamp,
+                "end": end.timestamp,
+                "pid": end.pid,
+                "rss_mb": end.rss_mb,
+                "rss_delta_mb": round(rss_delta, 3),
+                "load_1": load,
+                "events": total,
+                "classes": sorted({class_name for class_name, _ in methods}),
+            }
+        )
+        if not total:
+            return
+        class_counts = Counter()
+        for (class_name, method_name), count in methods.items():
+            class_counts[class_name] += count
+            share = rss_delta * count / total
+            self._accumulate(self.method_metrics, (class_name, method_name), share, load, count)
+        for class_name, count in class_counts.items():
+            self._accumulate(self.class_metrics, class_name, rss_delta * count / total, load, count)
+        edge_total = sum(edges.values())
+        for edge, count in edges.items():
+            self._accumulate(
+                self.edge_metrics, edge, rss_delta * count / edge_total, load, count
+            )
+
+    @staticmethod
+    def _accumulate(metrics: Dict, key, rss_delta: float, load: float, events: int):
+        entry = metrics.get(key)
+        if entry is None:
+            entry = metrics[key] = {
+                "rss_delta_mb": 0.0,
+                "max_load": 0.0,
+                "events": 0,
+                "intervals": 0,
+            }
+        entry["rss_delta_mb"] += rss_delta
+        entry["max_load"] = max(entry["max_load"], load)
+        entry["events"] += events
+        entry["intervals"] += 1
+
+    @staticmethod
+    def format(metrics: Dict[str, float]) -> str:
+        return f"RSS {metrics['rss_delta_mb']:+.1f} MB, load {metrics['max_load']:.0f}%"
+
+    def class_notes(self) -> Dict[str, str]:
+        return {name: self.format(metrics) for name, metrics in self.class_metrics.items()}
+
+    def edge_notes(self) -> Dict[EdgeKey, str]:
+        return {edge: self.format(metrics) for edge, metrics in self.edge_metrics.items()}
+
+
+def overlay_from_log(
+    source: Union[str, Iterable[str]], model: Optional[Dict[str, ClassModel]] = None
+) -> MetricsOverlay:
+    return MetricsOverlay(model).feed(iter_events_and_samples(source))
+
+
+def sample_divider(sample: PerfSample, previous: Optional[PerfSample] = None) -> str:
+    # Разделитель для PlantUML: "== RSS 19.3 MB (+0.4), load 87% =="
+    parts = []
+    if sample.rss_mb is not None:
+        rss = f"RSS {sample.rss_mb:.1f} MB"
+        if previous is not None and previous.rss_mb is not None:
+            rss += f" ({sample.rss_mb - previous.rss_mb:+.1f})"
+        parts.append(rss)
+    if sample.load_1 is not None:
+        parts.append(f"load {sample.load_1:.0f}%")
+    if sample.memory_available_mb is not None:
+        parts.append(f"available {sample.memory_available_mb:.0f} MB")
+    return f"== {', '.join(parts) or 'Performance Report'} =="
+
+
+if __name__ == "__main__":
+    overlay = overlay_from_log("examples/trace.tracer")
+    for interval in overlay.intervals:
+        print(interval)
+    for class_name, note in overlay.class_notes().items():
+        print(f"{class_name}: {note}")
@@ -1,77 +1,374 @@
+import hashlib
+import json
 import os
+import shutil
 import subprocess
-from typing import List
-from src.tracer_analyzer import Tracer, TracerAnalyzer
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple
+from src.path_index import attribute_tracers
+from src.perf_metrics import PerfSample, sample_divider
+from src.profiling import profiler
+from src.tracer_analyzer import EVENT_EXCEPTION, Tracer, stream_tracers
+
+
+# Пишет стрелки в тело диаграммы: повторяющиеся подпоследовательности длиной
+# до max_period сворачиваются в "loop N times", после page_size строк - newpage.
+# Окно ограничено 2 * max_period стрелками, поэтому проход линейный по событиям.
+class _ArrowWriter:
+    def __init__(self, body: IO, fold_loops: bool, max_period: int, page_size: Optional[int]):
+        self.body = body
+        self.max_period = max_period if fold_loops else 0
+        self.page_size = page_size
+        self.page_lines = 0
+        self.pending: List[str] = []
+        self.pattern: List[str] = []
+        self.repeats = 0
+        self.position = 0
+        self.loops = 0
+
+    def write(self, arrow: str):
+        if self.pattern:
+            if arrow == self.pattern[self.position]:
+                self.position += 1
+                if self.position == len(self.pattern):
+                    self.repeats += 1
+                    self.position = 0
+                return
+            # Цикл прервался: недописанный хвост повтора снова идёт в окно
+            tail = self.pattern[: self.position]
+            self._flush_loop()
+            for item in tail:
+                self._push(item)
+        self._push(arrow)
+
+    def _push(self, arrow: str):
+        pending = self.pending
+        pending.append(arrow)
+        for period in range(1, min(self.max_period, len(pending) // 2) + 1):
+            if pending[-period:] == pending[-2 * period : -period]:
+                self._emit(pending[: -2 * period])
+                self.pattern = pending[-period:]
+                self.repeats = 2
+                self.position = 0
+                self.pending = []
+                return
+        if len(pending) > 2 * self.max_period:
+            self._emit([pending.pop(0)])
+
+    def _flush_loop(self):
+        # Стрелки цикла + строки "loop" и "end"
+        self._page_break(len(self.pattern) + 2)
+        self.body.write(f"loop {self.repeats} times\n")
+        self.body.writelines(f"    {arrow}\n" for arrow in self.pattern)
+        self.body.write("end\n")
+        self.loops += 1
+        self.pattern = []
+        self.repeats = 0
+        self.position = 0
+
+    def _emit(self, arrows: List[str]):
+        for arrow in arrows:
+            self._page_break(1)
+            self.body.write(f"{arrow}\n")
+
+    def _page_break(self, lines: int):
+        # Блок loop не разрывается между страницами
+        if self.page_size and self.page_lines and self.page_lines + lines > self.page_size:
+            self.body.write("newpage\n")
+            self.page_lines = 0
+        self.page_lines += lines
+
+    def write_marker(self, line: str):
+        # Разделители и заметки не сворачиваются: окно дописывается, строка идёт за ним
+        self.close()
+        self._emit([line])
+
+    def close(self):
+        if self.pattern:
+            tail = self.pattern[: self.position]
+            self._flush_loop()
+            self.pending.extend(tail)
+        self._emit(self.pending)
+        self.pending = []
 
 
 # Class for generating PlantUML sequence diagrams from Tracers
 class PlantUMLGenerator:
-    def __init__(self, tracers: List[Tracer]):
-        # Сохраняем только те трассировки, где есть имя класса и метода
-        self.tracers = [t for t in tracers if t.class_name and t.method_name]
+    def __init__(
+        self,
+        tracers: Iterable[Tracer],
+        pid: Optional[int] = None,
+        fold_loops: bool = True,
+        max_period: int = 8,
+        page_size: Optional[int] = 1000,
+        model: Optional[dict] = None,
+        show_exceptions: bool = True,
+        samples: Optional[Iterable[PerfSample]] = None,
+    ):
+        # Список или ленивый поток (stream_tracers); поток читается один раз
+        self.tracers = tracers
+        # Статическая модель для привязки "Entering function ... in <path>" к классам
+        self.model = model
+        # Исключения показываются заметками над классом, где они возникли
+        self.show_exceptions = show_exceptions
+        # Отчёты производительности (perf_metrics.read_samples) - разделители
+        # "== RSS ..., load ... ==" в местах, соответствующих их времени
+        self.samples = sorted(
+            (sample for sample in samples or [] if sample.timestamp is not None),
+            key=lambda sample: sample.timestamp,
+        )
+        # Если задан pid, диаграмма строится только для этого процесса
+        self.pid = pid
+        # Свёртка повторов в loop-блоки и разбиение на страницы (строк на страницу)
+        self.fold_loops = fold_loops
+        self.max_period = max_period
+        self.page_size = page_size
 
-    def generate_sequence_diagram(self, output_file: str):
+    def _iter_tracers(self) -> Iterator[Tracer]:
+        # Используем только те трассировки, где есть имя класса и метода
+        tracers = self.tracers
+        if self.model is not None:
+            tracers = attribute_tracers(self.model, tracers)
+        return (
+            t
+            for t in tracers
+            if t.class_name
+            and t.method_name
+            and (self.pid is None or t.pid == self.pid)
+        )
+
+    def _write_bodies(self, per_process: bool) -> Dict[Optional[int], Tuple[IO, dict]]:
+        # Стрелки пишутся во временные файлы за один проход, участники
+        # собираются попутно - весь лог в памяти не держится
+        streams: Dict[Optional[int], Tuple[_ArrowWriter, dict]] = {}
+        # Track previous method per process for creating arrows on method change
+        previous: Dict[Optional[int], Tracer] = {}
+        arrows = 0
+        next_sample = 0
+        divider = None
+        for tracer in self._iter_tracers():
+            # Отчёты, время которых уже наступило, - разделители во все диаграммы
+            while (
+                next_sample < len(self.samples)
+                and tracer.timestamp is not None
+                and self.samples[next_sample].timestamp <= tracer.timestamp
+            ):
+                divider = sample_divider(
+                    self.samples[next_sample],
+                    self.samples[next_sample - 1] if next_sample else None,
+                )
+                next_sample += 1
+                for writer, _ in streams.values():
+                    writer.write_marker(divider)
+            key = tracer.pid if per_process else None
+            if key not in streams:
+                streams[key] = (
+                    _ArrowWriter(
+                        tempfile.TemporaryFile("w+", encoding="utf-8"),
+                        self.fold_loops,
+                        self.max_period,
+                        self.page_size,
+                    ),
+                    {},
+                )
+                if divider:
+                    streams[key][0].write_marker(divider)
+            writer, participants = streams[key]
+            participants.setdefault(tracer.class_name, None)
+
+            if tracer.event == EVENT_EXCEPTION:
+                if self.show_exceptions:
+                    writer.write_marker(
+                        f"note over {tracer.class_name} #F4B6B6 : {tracer.method_name}: {tracer.error}"
+                    )
+                continue
+
+            # If the current method is different from the previous one, draw an arrow
+            previous_tracer = previous.get(tracer.pid)
+            if previous_tracer and (
+                previous_tracer.class_name != tracer.class_name
+                or previous_tracer.method_name != tracer.method_name
+            ):
+                writer.write(
+                    f"{previous_tracer.class_name} -> {tracer.class_name} : {tracer.method_name}()"
+                )
+                arrows += 1
+
+            # Update the previous method
+            previous[tracer.pid] = tracer
+        for writer, _ in streams.values():
+            writer.close()
+        profiler.count("puml.arrows", arrows)
+        profiler.count("puml.loops", sum(writer.loops for writer, _ in streams.values()))
+        return {key: (writer.body, participants) for key, (writer, participants) in streams.items()}
+
+    @staticmethod
+    def _write_puml(output_file: str, body: IO, participants: dict):
         # Generate .puml file
         with open(output_file, "w") as f:
             f.write("@startuml\n\n")
 
-            # Define actors/participants with class.method format
-            participants = set()
-            for tracer in self.tracers:
-                participants.add(tracer.class_name)
-
+            # Define actors/participants in order of first appearance
             for participant in participants:
                 f.write(f'participant "{participant}" as {participant}\n')
 
             f.write("\n")
+            body.seek(0)
+            shutil.copyfileobj(body, f)
+            f.write("\n@enduml\n")
 
-            # Track previous method for creating arrows on method change
-            previous_lifeline = None
-            for tracer in self.tracers:
-                current_lifeline = f"{tracer.class_name}.{tracer.method_name}"
-
-                # If the current method is different from the previous one, draw an arrow
-                if previous_lifeline and previous_lifeline != current_lifeline:
-                    # Extract class names for the arrow (class.method)
-                    prev_class, _ = previous_lifeline.split(".")
-                    curr_class, _ = current_lifeline.split(".")
-                    f.write(f"{prev_class} -> {curr_class} : {tracer.method_name}()\n")
-
-                # Update the previous method
-                previous_lifeline = current_lifeline
+    def generate_sequence_diagram(self, output_file: str):
+        with profiler.stage("generate_sequence_diagram"):
+            streams = self._write_bodies(per_process=False)
+            body, participants = streams.get(None) or (
+                tempfile.TemporaryFile("w+", encoding="utf-8"),
+                {},
+            )
+            with body:
+                self._write_puml(output_file, body, participants)
 
-            f.write("\n@enduml\n")
+    def generate_sequence_diagrams_per_process(self, output_prefix: str) -> List[str]:
+        # Отдельная диаграмма на каждый процесс: <prefix>_<pid>.puml
+        output_files = []
+        for pid, (body, participants) in self._write_bodies(per_process=True).items():
+            output_file = f"{output_prefix}_{pid if pid is not None else 'unknown'}.puml"
+            with body:
+                self._write_puml(output_file, body, participants)
+            output_files.append(output_file)
+        return output_files
 
     def generate_png(self, puml_file: str):
         # Use PlantUML to convert the .puml file to .png
         try:
-            subprocess.run(["plantuml", "-tpng", puml_file], check=True)
+            with profiler.stage("plantuml"):
+                subprocess.run(["plantuml", "-tpng", puml_file], check=True)
             print(f"PNG image generated for {puml_file}")
         except subprocess.CalledProcessError as e:
             print(f"Error generating PNG: {e}")
 
 
-# Example usage
-if __name__ == "__main__":
-    log_dir = "examples"
-    for filename in os.listdir(log_dir):
-        if filename.endswith(".tracer"):
-            file_path = os.path.join(log_dir, filename)
+DEFAULT_HASH_FILE = ".puml_hashes.json"
+
+
+def _generate_puml(task: Tuple[str, str]) -> str:
+    # Выполняется в дочернем процессе: один лог -> один .puml
+    trace_file, puml_file = task
+    generator = PlantUMLGenerator(
+        stream_tracers(trace_file, skip_unmatched=True, keep_raw=False)
+    )
+    generator.generate_sequence_diagram(puml_file)
+    return puml_file
+
+
+def generate_puml_batch(
+    trace_files: Iterable[str], output_dir: str = ".", workers: Optional[int] = None
+) -> List[str]:
+    # .puml для всех логов; логи разбираются параллельно в пуле процессов
+    os.makedirs(output_dir, exist_ok=True)
+    tasks = [
+        (
+            trace_file,
+            os.path.join(output_dir, f"{os.path.splitext(os.path.basename(trace_file))[0]}.puml"),
+        )
+        for trace_file in trace_files
+    ]
+    workers = workers or os.cpu_count() or 1
+    with profiler.stage("generate_puml_batch"):
+        if workers == 1 or len(tasks) <= 1:
+            return [_generate_puml(task) for task in tasks]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(_generate_puml, tasks))
+
+
+def _puml_hash(puml_file: str) -> str:
+    with open(puml_file, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _load_hashes(hash_file: Optional[str]) -> Dict[str, Dict[str, str]]:
+    if not hash_file or not os.path.exists(hash_file):
+        return {}
+    try:
+        with open(hash_file, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
 
-            with open(file_path, encoding="utf-8") as f:
-                log = f.read()
 
-            analyzer = TracerAnalyzer(log)
-            tracers = analyzer.parse()
+def _save_hashes(hash_file: str, hashes: Dict[str, Dict[str, str]]):
+    tmp_file = f"{hash_file}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(hashes, f, indent=4, ensure_ascii=False)
+    os.replace(tmp_file, hash_file)
 
-            # Создаём генератор диаграммы для текущего файла
-            generator = PlantUMLGenerator(tracers)
 
-            # Определяем имена выходных файлов на основе исходного имени
-            base_name = os.path.splitext(filename)[0]
-            puml_file = f"{base_name}.puml"
-            png_file = f"{base_name}.png"
+def _run_plantuml(fmt: str, puml_files: List[str]) -> bool:
+    # Один запуск JVM на пачку файлов, внутри PlantUML рисует их в несколько потоков
+    try:
+        with profiler.stage(f"plantuml.{fmt}"):
+            subprocess.run(
+                ["plantuml", f"-t{fmt}", "-nbthread", "auto", *puml_files], check=True
+            )
+        return True
+    except (subprocess.CalledProcessError, OSError) as e:
+        print(f"Error generating {fmt.upper()}: {e}")
+        return False
+
+
+def render_puml_batch(
+    puml_files: Iterable[str],
+    formats: Iterable[str] = ("png",),
+    hash_file: Optional[str] = DEFAULT_HASH_FILE,
+    batch_size: int = 200,
+    workers: int = 1,
+) -> Dict[str, List[str]]:
+    # Файлы с тем же содержимым, что и при прошлой отрисовке, пропускаются
+    # (хэши .puml по форматам хранятся в hash_file, None - рисовать всё)
+    puml_files = list(dict.fromkeys(puml_files))
+    formats = list(dict.fromkeys(formats))
+    hashes = _load_hashes(hash_file)
+    current = {puml_file: _puml_hash(puml_file) for puml_file in puml_files}
+
+    batches = []
+    for fmt in formats:
+        changed = [
+            puml_file
+            for puml_file in puml_files
+            if hashes.get(os.path.abspath(puml_file), {}).get(fmt) != current[puml_file]
+            or not os.path.exists(f"{os.path.splitext(puml_file)[0]}.{fmt}")
+        ]
+        profiler.count("plantuml.skipped", len(puml_files) - len(changed))
+        # Длинный список файлов режется на пачки: ограничение длины командной строки
+        for start in range(0, len(changed), batch_size):
+            batches.append((fmt, changed[start : start + batch_size]))
+
+    rendered: Dict[str, List[str]] = {fmt: [] for fmt in formats}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        results = executor.map(lambda batch: _run_plantuml(*batch), batches)
+        for (fmt, batch), ok in zip(batches, results):
+            if not ok:
+                continue
+            rendered[fmt].extend(batch)
+            for puml_file in batch:
+                hashes.setdefault(os.path.abspath(puml_file), {})[fmt] = current[puml_file]
+
+    if hash_file:
+        _save_hashes(hash_file, hashes)
+    for fmt, files in rendered.items():
+        print(f"{fmt.upper()}: {len(files)} rendered, {len(puml_files) - len(files)} unchanged or failed")
+    return rendered
+
+
+# Example usage
+if __name__ == "__main__":
+    log_dir = "examples"
+    trace_files = sorted(
+        os.path.join(log_dir, filename)
+        for filename in os.listdir(log_dir)
+        if filename.endswith(".tracer")
+    )
 
-            # Генерация .puml и .png для каждого файла
-            generator.generate_sequence_diagram(puml_file)
-            generator.generate_png(puml_file)
+    # Сначала все .puml (параллельно), затем одна отрисовка на формат
+    puml_files = generate_puml_batch(trace_files)
+    render_puml_batch(puml_files, formats=("png", "svg"))
@@ -0,0 +1,164 @@
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Dict, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    def __init__(self, profiler: "Profiler", name: str):
+        self.profiler = profiler
+        self.name = name
+        self.cprofile = None
+
+    def __enter__(self):
+        if self.name == self.profiler.profile_stage:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+        # process_time() во вспомогательном потоке (dot.* в render_dot) включал бы
+        # работу других потоков, поэтому там считается CPU только своего потока
+        self.clock = (
+            time.process_time
+            if threading.current_thread() is threading.main_thread()
+            else time.thread_time
+        )
+        self.wall = time.perf_counter()
+        self.cpu = self.clock()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self.wall
+        cpu = self.clock() - self.cpu
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            self.profiler.dump_cprofile(self.name, self.cprofile)
+        self.profiler.add_time(self.name, wall, cpu)
+        return False
+
+
+# Opt-in instrumentation: stage timings, counters, peak memory and an
+# optional cProfile dump for one stage. Disabled by default, in which case
+# stage() and count() are no-ops.
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.profile_stage: Optional[str] = None
+        self.profile_dir = "."
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, int] = {}
+        self.cprofile_files: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._started = 0.0
+
+    def enable(
+        self,
+        profile_stage: Optional[str] = None,
+        profile_dir: str = ".",
+        trace_memory: bool = False,
+    ):
+        self.enabled = True
+        self.profile_stage = profile_stage
+        self.profile_dir = profile_dir
+        self.stages = {}
+        self.counters = {}
+        self.cprofile_files = {}
+        self._started = time.perf_counter()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def disable(self):
+        self.enabled = False
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def stage(self, name: str):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def count(self, name: str, value: int = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_time(self, name: str, wall: float, cpu: float):
+        with self._lock:
+            stage = self.stages.setdefault(name, {"calls": 0, "wall": 0.0, "cpu": 0.0})
+            stage["calls"] += 1
+            stage["wall"] += wall
+            stage["cpu"] += cpu
+
+    def dump_cprofile(self, name: str, cprofile: cProfile.Profile):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        output_file = os.path.join(self.profile_dir, f"{name}.prof")
+        cprofile.dump_stats(output_file)
+        self.cprofile_files[name] = output_file
+
+    def report(self) -> dict:
+        memory = {}
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            memory["python_current_mb"] = round(current / 1024 / 1024, 3)
+            memory["python_peak_mb"] = round(peak / 1024 / 1024, 3)
+        if resource is not None:
+            # ru_maxrss: килобайты в Linux, байты в macOS
+            maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            divider = 1024 * 1024 if sys.platform == "darwin" else 1024
+            memory["max_rss_mb"] = round(maxrss / divider, 3)
+        return {
+            "total_wall": round(time.perf_counter() - self._started, 6),
+            "stages": {
+                name: {
+                    "calls": stage["calls"],
+                    "wall": round(stage["wall"], 6),
+                    "cpu": round(stage["cpu"], 6),
+                }
+                for name, stage in self.stages.items()
+            },
+            "counters": dict(self.counters),
+            "memory": memory,
+            "cprofile": dict(self.cprofile_files),
+        }
+
+    def save_report(self, output_file: str = "profile_report.json"):
+        with open(output_file, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=4, ensure_ascii=False)
+
+    def summary(self) -> str:
+        report = self.report()
+        lines = [f"Total: {report['total_wall']:.3f} s"]
+        for name, stage in sorted(report["stages"].items(), key=lambda item: -item[1]["wall"]):
+            lines.append(
+                f"  {name:<32} {stage['wall']:>9.3f} s wall {stage['cpu']:>9.3f} s cpu "
+                f"x{stage['calls']}"
+            )
+        for name, value in report["counters"].items():
+            lines.append(f"  {name:<32} {value}")
+        for name, value in report["memory"].items():
+            lines.append(f"  {name:<32} {value} MB")
+        for name, output_file in report["cprofile"].items():
+            lines.append(f"  cProfile {name:<23} {output_file}")
+        return "\n".join(lines)
+
+
+profiler = Profiler()
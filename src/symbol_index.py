@@ -0,0 +1,201 @@
+import ast
+import os
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from src.code_analyzer import ClassModel, PythonStaticAnalyzer
+
+
+# Index over the static model: qualified ids, import-aware call resolution
+# and forward/reverse adjacency lists
+#
+# Ids: "<directory>/<filename>::<Class>" for classes and
+#      "<directory>/<filename>::<Class>.<method>" for methods
+class SymbolIndex:
+    def __init__(self, classes: Iterable[ClassModel], read_imports: bool = True):
+        self.read_imports = read_imports
+        self.classes: Dict[str, ClassModel] = {}
+        self.by_name: Dict[str, List[str]] = {}
+        self.by_file: Dict[str, Dict[str, str]] = {}
+        self.methods_of: Dict[str, Dict[str, str]] = {}
+        self.class_of_method: Dict[str, str] = {}
+        self.parents: Dict[str, List[str]] = {}
+        self.children: Dict[str, List[str]] = {}
+        self.forward: Dict[str, List[str]] = {}
+        self.reverse: Dict[str, List[str]] = {}
+        self.unresolved: Dict[str, List[str]] = {}
+        self._imports: Dict[str, Dict[str, Tuple[str, str]]] = {}
+
+        for class_model in classes:
+            self._add_class(class_model)
+        for class_id, class_model in self.classes.items():
+            for parent in class_model.parents:
+                parent_id = self._resolve_class(parent, class_id)
+                if parent_id:
+                    self.parents.setdefault(class_id, []).append(parent_id)
+                    self.children.setdefault(parent_id, []).append(class_id)
+        for class_id, class_model in self.classes.items():
+            for method in class_model.methods:
+                method_id = self.methods_of[class_id][method.name]
+                for called_name in dict.fromkeys(method.calls):
+                    target = self._resolve_call(called_name, class_id)
+                    if target is None:
+                        self.unresolved.setdefault(method_id, []).append(called_name)
+                    elif target != method_id:
+                        self.forward.setdefault(method_id, []).append(target)
+                        self.reverse.setdefault(target, []).append(method_id)
+
+    @classmethod
+    def from_analyzer(cls, analyzer: PythonStaticAnalyzer, **kwargs) -> "SymbolIndex":
+        # class_list содержит и одноимённые классы, которые в model перезаписаны
+        classes = analyzer.class_list or [
+            class_model
+            for name, class_model in analyzer.get_model().items()
+            if name != "tracer"
+        ]
+        return cls(classes, **kwargs)
+
+    @staticmethod
+    def file_key(class_model: ClassModel) -> str:
+        return f"{class_model.directory}/{class_model.filename}"
+
+    @classmethod
+    def class_id(cls, class_model: ClassModel) -> str:
+        return f"{cls.file_key(class_model)}::{class_model.name}"
+
+    def _add_class(self, class_model: ClassModel):
+        class_id = self.class_id(class_model)
+        self.classes[class_id] = class_model
+        self.by_name.setdefault(class_model.name, []).append(class_id)
+        self.by_file.setdefault(self.file_key(class_model), {})[class_model.name] = class_id
+        methods = self.methods_of.setdefault(class_id, {})
+        for method in class_model.methods:
+            method_id = f"{class_id}.{method.name}"
+            methods[method.name] = method_id
+            self.class_of_method[method_id] = class_id
+
+    def _file_imports(self, file_key: str) -> Dict[str, Tuple[str, str]]:
+        # alias -> (модуль, имя); файлы читаются лениво и один раз
+        imports = self._imports.get(file_key)
+        if imports is not None:
+            return imports
+        imports = {}
+        self._imports[file_key] = imports
+        if not self.read_imports or not os.path.isfile(file_key):
+            return imports
+        try:
+            with open(file_key, encoding="utf-8") as f:
+                tree = ast.parse(f.read())
+        except (OSError, SyntaxError, ValueError, UnicodeDecodeError):
+            return imports
+        package = os.path.dirname(file_key)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.ImportFrom):
+                module = (node.module or "").replace(".", "/")
+                if node.level:
+                    base = package
+                    for _ in range(node.level - 1):
+                        base = os.path.dirname(base)
+                    module = os.path.join(base, module) if module else base
+                for alias in node.names:
+                    imports[alias.asname or alias.name] = (module, alias.name)
+            elif isinstance(node, ast.Import):
+                for alias in node.names:
+                    module = alias.name.replace(".", "/")
+                    imports[alias.asname or alias.name.split(".")[0]] = (module, "")
+        return imports
+
+    @staticmethod
+    def _module_matches(file_key: str, module: str) -> bool:
+        path = file_key[:-3] if file_key.endswith(".py") else file_key
+        if path.endswith("/__init__"):
+            path = path[: -len("/__init__")]
+        return path == module or path.endswith("/" + module)
+
+    def _resolve_class(self, name: str, from_class_id: str) -> Optional[str]:
+        file_key = self.file_key(self.classes[from_class_id])
+        # 1. класс из того же файла
+        local = self.by_file.get(file_key, {}).get(name)
+        if local:
+            return local
+        # 2. импортированное имя: кандидаты фильтруются по модулю
+        imported = self._file_imports(file_key).get(name)
+        if imported and imported[1]:
+            module, original_name = imported
+            for candidate in self.by_name.get(original_name, []):
+                if self._module_matches(self.file_key(self.classes[candidate]), module):
+                    return candidate
+        # 3. единственный класс с таким именем во всём дереве
+        candidates = self.by_name.get(name, [])
+        if len(candidates) == 1:
+            return candidates[0]
+        if not candidates:
+            # Родитель module.Class сохранён анализатором как module_Class
+            for position, char in enumerate(name):
+                if char == "_" and position and name[position + 1 :] in self.by_name:
+                    return self._resolve_class(name[position + 1 :], from_class_id)
+        return None
+
+    def _resolve_call(self, name: str, class_id: str) -> Optional[str]:
+        # Метод своего класса или ближайшего предка
+        seen = set()
+        queue = deque([class_id])
+        while queue:
+            current = queue.popleft()
+            if current in seen:
+                continue
+            seen.add(current)
+            method_id = self.methods_of.get(current, {}).get(name)
+            if method_id:
+                return method_id
+            queue.extend(self.parents.get(current, []))
+        # Конструктор класса
+        return self._resolve_class(name, class_id)
+
+    def lookup(self, name: str) -> List[str]:
+        # "Class", "Class.method" или полный id
+        if name in self.classes or name in self.class_of_method:
+            return [name]
+        class_name, _, method_name = name.partition(".")
+        class_ids = self.by_name.get(class_name, [])
+        if not method_name:
+            return list(class_ids)
+        return [
+            self.methods_of[class_id][method_name]
+            for class_id in class_ids
+            if method_name in self.methods_of[class_id]
+        ]
+
+    def _expand(self, node_id: str) -> List[str]:
+        # Класс представлен собой и своими методами
+        if node_id in self.classes:
+            return [node_id] + list(self.methods_of[node_id].values())
+        return [node_id]
+
+    def callees(self, node_id: str) -> List[str]:
+        result = []
+        for source in self._expand(node_id):
+            result.extend(self.forward.get(source, []))
+        return list(dict.fromkeys(result))
+
+    def callers(self, node_id: str) -> List[str]:
+        result = []
+        for target in self._expand(node_id):
+            result.extend(self.reverse.get(target, []))
+        return list(dict.fromkeys(result))
+
+    def reachable(self, node_id: str, max_depth: Optional[int] = None) -> Set[str]:
+        visited = {node_id}
+        frontier = [node_id]
+        depth = 0
+        while frontier and (max_depth is None or depth < max_depth):
+            depth += 1
+            next_frontier = []
+            for current in frontier:
+                for target in self.callees(current):
+                    if target not in visited:
+                        visited.add(target)
+                        next_frontier.append(target)
+            frontier = next_frontier
+        visited.discard(node_id)
+        return visited
@@ -0,0 +1,196 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import AsyncIterator, Optional
+
+from src.code_analyzer import PythonStaticAnalyzer, TracerEdgeCounter
+from src.diagramm_creater import GraphvizDiagramBuilder, Modes
+from src.path_index import TraceAttributor
+from src.plant_uml_generator import PlantUMLGenerator
+from src.tracer_analyzer import TracerAnalyzer
+
+# Лог читается блоками, чтобы многогигабайтный файл не попадал в память целиком
+READ_BLOCK = 1 << 20
+
+
+# Live follow mode: tails a growing trace log (like tail -f) and re-renders
+# the diagram when new tracer connections appear
+class TraceFollower:
+    def __init__(
+        self,
+        log_path: str,
+        analyzer: PythonStaticAnalyzer,
+        output_file: str = "UML_Class_diagram",
+        mode: Modes = Modes.TRACER,
+        puml_file: Optional[str] = None,
+        pid: Optional[int] = None,
+        poll_interval: float = 0.5,
+        debounce: float = 2.0,
+        max_delay: float = 10.0,
+        from_start: bool = True,
+        puml_window: int = 10000,
+    ):
+        self.log_path = log_path
+        self.analyzer = analyzer
+        # Полная статическая модель; фильтрация по трассировке её не изменяет
+        self.base_model = analyzer.get_model().copy()
+        self.output_file = output_file
+        self.mode = mode
+        self.puml_file = puml_file
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.from_start = from_start
+        self.tracer_analyzer = TracerAnalyzer()
+        self.counter = TracerEdgeCounter(pid)
+        self.attributor = TraceAttributor(self.base_model)
+        # Для PlantUML храним только последние события
+        self.recent_events = deque(maxlen=puml_window)
+        self.edge_version = 0
+        self.rendered_version = 0
+        self._changed = asyncio.Event()
+
+    @staticmethod
+    def _split(pending: str, chunk: str):
+        lines = (pending + chunk).split("\n")
+        # Незавершённая последняя строка ждёт следующего чтения
+        return lines, lines.pop()
+
+    async def _tail(self) -> AsyncIterator[str]:
+        f = None
+        inode = None
+        position = 0
+        pending = ""
+        try:
+            while True:
+                try:
+                    stat = os.stat(self.log_path)
+                except FileNotFoundError:
+                    # Файл ротирован и ещё не создан заново
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+
+                if f is None or stat.st_ino != inode:
+                    # Первое открытие или ротация: новый файл читается с начала
+                    if f is not None:
+                        # Дочитываем старый файл: строки, записанные до ротации
+                        while True:
+                            chunk = f.read(READ_BLOCK)
+                            if not chunk:
+                                break
+                            lines, pending = self._split(pending, chunk)
+                            for line in lines:
+                                yield line
+                        if pending:
+                            yield pending
+                        f.close()
+                        position = 0
+                    f = open(self.log_path, encoding="utf-8", errors="replace")
+                    inode = stat.st_ino
+                    if position == 0 and not self.from_start:
+                        position = stat.st_size
+                    self.from_start = True
+                    f.seek(position)
+                    pending = ""
+                elif stat.st_size < position:
+                    # Файл усечён (copytruncate)
+                    f.seek(0)
+                    position = 0
+                    pending = ""
+
+                chunk = f.read(READ_BLOCK)
+                if not chunk:
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                position = f.tell()
+                lines, pending = self._split(pending, chunk)
+                for line in lines:
+                    yield line
+                # Большой хвост читается блоками подряд, но рендер не блокируется
+                await asyncio.sleep(0)
+        finally:
+            if f is not None:
+                f.close()
+
+    async def _consume(self):
+        async for line in self._tail():
+            tracer = self.tracer_analyzer.parse_line(line, keep_raw=False)
+            if not tracer.event:
+                continue
+            self.attributor.attribute(tracer)
+            if not tracer.class_name:
+                continue
+            self.recent_events.append(tracer)
+            if self.counter.add(tracer):
+                self.edge_version += 1
+                self._changed.set()
+
+    def render(self, counter: Optional[TracerEdgeCounter] = None, events: Optional[list] = None):
+        # Вызывается в потоке executor: только снимки, сделанные в потоке цикла событий
+        counter = counter if counter is not None else self.counter.snapshot()
+        events = events if events is not None else list(self.recent_events)
+        model = self.analyzer.build_tracer_model(counter, self.base_model)
+        GraphvizDiagramBuilder(model, self.mode).save_diagram_png(self.output_file)
+        if self.puml_file:
+            PlantUMLGenerator(events).generate_sequence_diagram(self.puml_file)
+
+    async def _render_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._changed.wait()
+            # Debounce: ждём паузы в появлении новых связей, но не дольше max_delay
+            started = time.monotonic()
+            while True:
+                self._changed.clear()
+                await asyncio.sleep(self.debounce)
+                if not self._changed.is_set() or time.monotonic() - started >= self.max_delay:
+                    break
+            self._changed.clear()
+            if self.edge_version == self.rendered_version:
+                continue
+            version = self.edge_version
+            # _consume продолжает менять counter и recent_events, поэтому в
+            # executor уходят копии
+            counter = self.counter.snapshot()
+            events = list(self.recent_events)
+            try:
+                await loop.run_in_executor(None, self.render, counter, events)
+            except Exception as e:
+                # Ошибка одного рендера не останавливает слежение
+                print(f"Error rendering diagram: {e}")
+            self.rendered_version = version
+            # Связи, появившиеся во время рендера, вызовут следующий проход
+            if self.edge_version != self.rendered_version:
+                self._changed.set()
+
+    async def run(self, duration: Optional[float] = None):
+        tasks = [
+            asyncio.create_task(self._consume()),
+            asyncio.create_task(self._render_loop()),
+        ]
+        try:
+            if duration is None:
+                await asyncio.gather(*tasks)
+            else:
+                await asyncio.sleep(duration)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def follow(log_path: str, analyzer: PythonStaticAnalyzer, **kwargs):
+    follower = TraceFollower(log_path, analyzer, **kwargs)
+    try:
+        asyncio.run(follower.run())
+    except KeyboardInterrupt:
+        pass
+    return follower
+
+
+# Example usage
+if __name__ == "__main__":
+    analyzer = PythonStaticAnalyzer("src")
+    analyzer.analyze()
+    follow("examples/trace.txt", analyzer, puml_file="trace_live.puml")
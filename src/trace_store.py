@@ -0,0 +1,274 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from src.tracer_analyzer import (
+    EVENT_EXCEPTION,
+    EVENT_FUNCTION,
+    EVENTS,
+    Tracer,
+    stream_tracers,
+)
+
+
+# Interned names: each distinct class/method name is stored once
+class SymbolTable:
+    def __init__(self, symbols: Optional[List[str]] = None):
+        self.symbols: List[str] = list(symbols or [])
+        self.ids: Dict[str, int] = {name: i for i, name in enumerate(self.symbols)}
+
+    def intern(self, name: Optional[str]) -> int:
+        if name is None:
+            return -1
+        symbol_id = self.ids.get(name)
+        if symbol_id is None:
+            symbol_id = len(self.symbols)
+            self.symbols.append(name)
+            self.ids[name] = symbol_id
+        return symbol_id
+
+    def lookup(self, symbol_id: int) -> Optional[str]:
+        return self.symbols[symbol_id] if symbol_id >= 0 else None
+
+    def __len__(self):
+        return len(self.symbols)
+
+
+# Compact column store of trace events: integer ids instead of Tracer objects
+class TraceStore:
+    MAGIC = b"TRCSTORE"
+    VERSION = 2
+    # magic, version, events, symbols block size, flags
+    HEADER = struct.Struct("<8sIQQI")
+    FLAG_PID = 1
+    FLAG_TIMESTAMP = 2
+    FLAG_BIG_ENDIAN = 4
+
+    def __init__(self, with_pid: bool = False, with_timestamp: bool = False):
+        self.symbols = SymbolTable()
+        self.class_ids = array("i")
+        self.method_ids = array("i")
+        # Индекс вида события в EVENTS и строка-подробность: путь файла для
+        # "function" или текст ошибки для "exception" (виды взаимоисключающие)
+        self.event_ids = array("b")
+        self.detail_ids = array("i")
+        self.pids = array("i") if with_pid else None
+        self.timestamps = array("d") if with_timestamp else None
+        self._mmap = None
+
+    @classmethod
+    def from_tracers(
+        cls,
+        tracers: Iterable[Tracer],
+        with_pid: bool = False,
+        with_timestamp: bool = False,
+    ) -> "TraceStore":
+        store = cls(with_pid=with_pid, with_timestamp=with_timestamp)
+        for tracer in tracers:
+            if tracer.event or tracer.class_name or tracer.method_name:
+                store.append(
+                    tracer.class_name,
+                    tracer.method_name,
+                    tracer.pid,
+                    tracer.timestamp,
+                    tracer.event,
+                    tracer.file_path or tracer.error,
+                )
+        return store
+
+    @classmethod
+    def from_log(cls, log_path: str, store_path: Optional[str] = None, **kwargs) -> "TraceStore":
+        # Повторные запуски по тому же логу читают готовый бинарный файл
+        store_path = store_path or f"{log_path}.tstore"
+        if (
+            os.path.exists(store_path)
+            and os.path.getmtime(store_path) >= os.path.getmtime(log_path)
+        ):
+            try:
+                store = cls.load(store_path)
+            except ValueError:
+                # Файл старой версии формата - пересобираем
+                store = None
+            if store is not None:
+                # Сохранённый без нужных колонок (pid, timestamp) файл пересобирается;
+                # уже имевшиеся колонки сохраняются, чтобы не пересобирать по кругу
+                missing_pid = kwargs.get("with_pid") and store.pids is None
+                missing_timestamp = kwargs.get("with_timestamp") and store.timestamps is None
+                if not (missing_pid or missing_timestamp):
+                    return store
+                kwargs["with_pid"] = kwargs.get("with_pid") or store.pids is not None
+                kwargs["with_timestamp"] = (
+                    kwargs.get("with_timestamp") or store.timestamps is not None
+                )
+                store.close()
+        store = cls.from_tracers(
+            stream_tracers(log_path, skip_unmatched=True, keep_raw=False), **kwargs
+        )
+        store.save(store_path)
+        return store
+
+    def _ensure_writable(self):
+        # Колонки из mmap доступны только на чтение - копируем при первой записи
+        if self._mmap is None:
+            return
+        columns = self._columns()
+        (
+            self.class_ids,
+            self.method_ids,
+            self.event_ids,
+            self.detail_ids,
+            self.pids,
+            self.timestamps,
+        ) = [
+            array(column.format, column) if column is not None else None
+            for column in columns
+        ]
+        for column in columns:
+            if isinstance(column, memoryview):
+                column.release()
+        self._mmap.close()
+        self._mmap = None
+
+    def append(
+        self,
+        class_name: Optional[str],
+        method_name: Optional[str],
+        pid: Optional[int] = None,
+        timestamp: Optional[float] = None,
+        event: Optional[str] = None,
+        detail: Optional[str] = None,
+    ):
+        self._ensure_writable()
+        self.class_ids.append(self.symbols.intern(class_name))
+        self.method_ids.append(self.symbols.intern(method_name))
+        self.event_ids.append(EVENTS.index(event) if event else -1)
+        self.detail_ids.append(self.symbols.intern(detail))
+        if self.pids is not None:
+            self.pids.append(pid if pid is not None else -1)
+        if self.timestamps is not None:
+            self.timestamps.append(timestamp if timestamp is not None else float("nan"))
+
+    def __len__(self):
+        return len(self.class_ids)
+
+    def __iter__(self) -> Iterator[Tracer]:
+        # Совместимо с filter_model_by_tracer и PlantUMLGenerator
+        lookup = self.symbols.lookup
+        pids, timestamps = self.pids, self.timestamps
+        for index in range(len(self.class_ids)):
+            event_id = self.event_ids[index]
+            tracer = Tracer(
+                raw_text="",
+                class_name=lookup(self.class_ids[index]),
+                method_name=lookup(self.method_ids[index]),
+                event=EVENTS[event_id] if event_id >= 0 else None,
+            )
+            if tracer.event == EVENT_FUNCTION:
+                tracer.file_path = lookup(self.detail_ids[index])
+            elif tracer.event == EVENT_EXCEPTION:
+                tracer.error = lookup(self.detail_ids[index])
+            if pids is not None and pids[index] >= 0:
+                tracer.pid = pids[index]
+            if timestamps is not None and timestamps[index] == timestamps[index]:
+                tracer.timestamp = timestamps[index]
+            yield tracer
+
+    def _columns(self) -> list:
+        return [
+            self.class_ids,
+            self.method_ids,
+            self.event_ids,
+            self.detail_ids,
+            self.pids,
+            self.timestamps,
+        ]
+
+    def nbytes(self) -> int:
+        return sum(
+            len(column) * column.itemsize
+            for column in self._columns()
+            if column is not None
+        )
+
+    @staticmethod
+    def _padding(size: int) -> bytes:
+        return b"\0" * (-size % 8)
+
+    def save(self, path: str):
+        flags = 0
+        if self.pids is not None:
+            flags |= self.FLAG_PID
+        if self.timestamps is not None:
+            flags |= self.FLAG_TIMESTAMP
+        if sys.byteorder == "big":
+            flags |= self.FLAG_BIG_ENDIAN
+        symbols_block = json.dumps(self.symbols.symbols, ensure_ascii=False).encode("utf-8")
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.VERSION, len(self), len(symbols_block), flags))
+            f.write(symbols_block + self._padding(len(symbols_block)))
+            for column in self._columns():
+                if column is not None:
+                    data = column.tobytes()
+                    f.write(data + self._padding(len(data)))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "TraceStore":
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, events, symbols_size, flags = cls.HEADER.unpack_from(mm, 0)
+        if magic != cls.MAGIC or version != cls.VERSION:
+            mm.close()
+            raise ValueError(f"{path} is not a trace store (version {cls.VERSION})")
+
+        store = cls()
+        offset = cls.HEADER.size
+        store.symbols = SymbolTable(json.loads(mm[offset : offset + symbols_size].decode("utf-8")))
+        offset += symbols_size + len(cls._padding(symbols_size))
+
+        swap = bool(flags & cls.FLAG_BIG_ENDIAN) != (sys.byteorder == "big")
+        view = memoryview(mm)
+
+        def column(typecode: str):
+            nonlocal offset
+            size = events * array(typecode).itemsize
+            if swap:
+                data = array(typecode, view[offset : offset + size].tobytes())
+                data.byteswap()
+            else:
+                # Без копирования: колонка читается прямо из отображённого файла
+                data = view[offset : offset + size].cast(typecode)
+            offset += size + len(cls._padding(size))
+            return data
+
+        store.class_ids = column("i")
+        store.method_ids = column("i")
+        store.event_ids = column("b")
+        store.detail_ids = column("i")
+        store.pids = column("i") if flags & cls.FLAG_PID else None
+        store.timestamps = column("d") if flags & cls.FLAG_TIMESTAMP else None
+        view.release()
+        if swap:
+            mm.close()
+        else:
+            store._mmap = mm
+        return store
+
+    def close(self):
+        if self._mmap is None:
+            return
+        for column in self._columns():
+            if isinstance(column, memoryview):
+                column.release()
+        self.class_ids, self.method_ids = array("i"), array("i")
+        self.event_ids, self.detail_ids = array("b"), array("i")
+        self.pids = array("i") if self.pids is not None else None
+        self.timestamps = array("d") if self.timestamps is not None else None
+        self._mmap.close()
+        self._mmap = None
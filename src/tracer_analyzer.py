@@ -1,42 +1,256 @@
+import os
 import re
-from typing import List, Optional
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from src.profiling import profiler
+
+MONTHS = {
+    name: index
+    for index, name in enumerate(
+        ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+    )
+}
+DAYS_BEFORE_MONTH = [0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334]
+
+# Виды событий трассы
+EVENT_CLASS = "class"  # Entering class: X, function: Y
+EVENT_FUNCTION = "function"  # Entering function: Y in path/to/file.py
+EVENT_EXCEPTION = "exception"  # Exception in Y: Error - message
+EVENTS = (EVENT_CLASS, EVENT_FUNCTION, EVENT_EXCEPTION)
 
 
 # Model Tracer to store data
 class Tracer:
-    def __init__(self, raw_text: str, class_name: Optional[str] = None, method_name: Optional[str] = None):
+    __slots__ = (
+        "raw_text",
+        "class_name",
+        "method_name",
+        "timestamp",
+        "host",
+        "program",
+        "pid",
+        "event",
+        "file_path",
+        "error",
+    )
+
+    def __init__(
+        self,
+        raw_text: str,
+        class_name: Optional[str] = None,
+        method_name: Optional[str] = None,
+        timestamp: Optional[float] = None,
+        host: Optional[str] = None,
+        program: Optional[str] = None,
+        pid: Optional[int] = None,
+        event: Optional[str] = None,
+        file_path: Optional[str] = None,
+        error: Optional[str] = None,
+    ):
         self.raw_text = raw_text
         self.class_name = class_name
         self.method_name = method_name
+        # Поля заголовка syslog; timestamp - секунды от начала года
+        self.timestamp = timestamp
+        self.host = host
+        self.program = program
+        self.pid = pid
+        # Вид события; для "function" - путь к файлу, для "exception" - текст ошибки
+        self.event = event
+        self.file_path = file_path
+        self.error = error
 
     def __repr__(self):
-        return f"Tracer(raw_text={self.raw_text!r}, class_name={self.class_name!r}, method_name={self.method_name!r})"
+        return f"Tracer(raw_text={self.raw_text!r}, class_name={self.class_name!r}, method_name={self.method_name!r}, pid={self.pid!r}, event={self.event!r})"
+
+
+@lru_cache(maxsize=4096)
+def syslog_timestamp(text: str) -> Optional[float]:
+    # "Sep  3 18:53:00" -> секунды от начала года (год в syslog не пишется)
+    parts = text.split()
+    month = MONTHS.get(parts[0])
+    if month is None or len(parts) != 3:
+        return None
+    hours, minutes, seconds = (int(part) for part in parts[2].split(":"))
+    days = DAYS_BEFORE_MONTH[month] + int(parts[1]) - 1
+    return float(((days * 24 + hours) * 60 + minutes) * 60 + seconds)
 
 
 # Class for log analysis
 class TracerAnalyzer:
-    def __init__(self, log: str):
+    def __init__(self, log: str = ""):
         self.log = log
         self.class_method_pattern = re.compile(
             r"Entering class: (?P<class>\w+), function: (?P<method>\w+)"
         )
+        self.function_pattern = re.compile(
+            r"Entering function: (?P<method>\S+) in (?P<path>\S+)"
+        )
+        self.exception_pattern = re.compile(
+            r"Exception in (?P<method>[^:\s]+): (?P<error>.*)$"
+        )
+        # Быстрая проверка строки перед полным разбором
+        self.event_pattern = re.compile(r"Entering (?:class|function): |Exception in ")
+        # "Sep  3 18:53:00 synonyx-A-81 shell[21974]: ..."
+        self.syslog_pattern = re.compile(
+            r"^(?P<timestamp>[A-Z][a-z]{2}\s+\d{1,2} \d{2}:\d{2}:\d{2}) "
+            r"(?P<host>\S+) (?P<program>[^\s\[:]+)(?:\[(?P<pid>\d+)\])?:"
+        )
 
-    def parse(self) -> List[Tracer]:
-        tracers = []
-        for line in self.log.splitlines():
-            match = self.class_method_pattern.search(line)
+    def parse_line(self, line: str, keep_raw: bool = True) -> Tracer:
+        raw_text = line if keep_raw else ""
+        # Create a Tracer object with only the raw text, details are filled below
+        tracer = Tracer(raw_text=raw_text)
+        match = self.class_method_pattern.search(line)
+        if match:
+            # Class and method details
+            tracer.class_name = match.group("class")
+            tracer.method_name = match.group("method")
+            tracer.event = EVENT_CLASS
+        elif "Entering function: " in line:
+            # Класс определяется позже по пути файла (src/path_index.py)
+            match = self.function_pattern.search(line)
             if match:
-                # Create a Tracer object with class and method details
-                class_name = match.group("class")
-                method_name = match.group("method")
-                tracer = Tracer(
-                    raw_text=line, class_name=class_name, method_name=method_name
-                )
+                tracer.method_name = match.group("method")
+                tracer.file_path = match.group("path")
+                tracer.event = EVENT_FUNCTION
+        elif "Exception in " in line:
+            match = self.exception_pattern.search(line)
+            if match:
+                tracer.method_name = match.group("method")
+                tracer.error = match.group("error").strip()
+                tracer.event = EVENT_EXCEPTION
+        self._parse_header(line, tracer)
+        return tracer
+
+    def _parse_header(self, line: str, tracer: Tracer):
+        header = self.syslog_pattern.match(line)
+        if header:
+            tracer.timestamp = syslog_timestamp(header.group("timestamp"))
+            tracer.host = header.group("host")
+            tracer.program = header.group("program")
+            if header.group("pid"):
+                tracer.pid = int(header.group("pid"))
+
+    def parse(self) -> List[Tracer]:
+        with profiler.stage("trace.parse"):
+            return list(self.iter_parse(self.log.splitlines()))
+
+    def iter_parse(
+        self,
+        lines: Iterable[str],
+        skip_unmatched: bool = False,
+        keep_raw: bool = True,
+    ) -> Iterator[Tracer]:
+        # Ленивый разбор: в памяти держится только текущая строка
+        matched = skipped = 0
+        try:
+            for line in lines:
+                line = line.rstrip("\r\n")
+                if skip_unmatched and not self.event_pattern.search(line):
+                    skipped += 1
+                    continue
+                tracer = self.parse_line(line, keep_raw)
+                if tracer.event:
+                    matched += 1
+                else:
+                    skipped += 1
+                yield tracer
+        finally:
+            profiler.count("trace.lines_matched", matched)
+            profiler.count("trace.lines_skipped", skipped)
+
+
+def _iter_lines(source: Union[str, Iterable[str]]) -> Iterator[str]:
+    if isinstance(source, str):
+        # Байты считаются по сырым строкам, поэтому файл читается в бинарном режиме
+        bytes_read = 0
+        try:
+            with open(source, "rb") as f:
+                for raw_line in f:
+                    bytes_read += len(raw_line)
+                    yield raw_line.decode("utf-8", errors="replace")
+        finally:
+            profiler.count("trace.bytes_read", bytes_read)
+    else:
+        yield from source
+
+
+def stream_tracers(
+    source: Union[str, Iterable[str]],
+    skip_unmatched: bool = False,
+    keep_raw: bool = True,
+) -> Iterator[Tracer]:
+    # source - путь к файлу или любой итерируемый источник строк (открытый файл, сокет)
+    return TracerAnalyzer().iter_parse(
+        _iter_lines(source), skip_unmatched=skip_unmatched, keep_raw=keep_raw
+    )
+
+
+def split_by_pid(tracers: Iterable[Tracer]) -> Dict[Optional[int], List[Tracer]]:
+    # Разделяем перемешанный лог на потоки событий отдельных процессов
+    streams: Dict[Optional[int], List[Tracer]] = {}
+    for tracer in tracers:
+        streams.setdefault(tracer.pid, []).append(tracer)
+    return streams
+
+
+def _parse_chunk(task: Tuple[str, int, int, bool, bool]) -> Tuple[List[Tracer], int, int]:
+    # Кусок владеет строками, которые начинаются в [start, end);
+    # счётчики строк возвращаются в родительский процесс вместе с событиями
+    path, start, end, skip_unmatched, keep_raw = task
+    analyzer = TracerAnalyzer()
+    tracers = []
+    matched = skipped = 0
+    with open(path, "rb") as f:
+        if start > 0:
+            f.seek(start - 1)
+            f.readline()
+        position = f.tell()
+        while position < end:
+            raw_line = f.readline()
+            if not raw_line:
+                break
+            position += len(raw_line)
+            line = raw_line.decode("utf-8", errors="replace").rstrip("\r\n")
+            if skip_unmatched and not analyzer.event_pattern.search(line):
+                skipped += 1
+                continue
+            tracer = analyzer.parse_line(line, keep_raw)
+            if tracer.event:
+                matched += 1
             else:
-                # Create a Tracer object with only the raw text
-                tracer = Tracer(raw_text=line)
+                skipped += 1
             tracers.append(tracer)
-        return tracers
+    return tracers, matched, skipped
+
+
+def parse_file_parallel(
+    path: str,
+    workers: Optional[int] = None,
+    chunk_size: int = 32 * 1024 * 1024,
+    skip_unmatched: bool = True,
+    keep_raw: bool = False,
+) -> List[Tracer]:
+    # Большой лог режется на куски по байтам с выравниванием по строкам,
+    # куски разбираются в пуле процессов, порядок событий сохраняется
+    size = os.path.getsize(path)
+    tasks = [
+        (path, start, min(start + chunk_size, size), skip_unmatched, keep_raw)
+        for start in range(0, size, chunk_size)
+    ]
+    with profiler.stage("trace.parse_parallel"):
+        if len(tasks) <= 1 or workers == 1:
+            chunks = [_parse_chunk(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                chunks = list(executor.map(_parse_chunk, tasks))
+        profiler.count("trace.bytes_read", size)
+        profiler.count("trace.lines_matched", sum(matched for _, matched, _ in chunks))
+        profiler.count("trace.lines_skipped", sum(skipped for _, _, skipped in chunks))
+        return [tracer for tracers, _, _ in chunks for tracer in tracers]
 
 
 if __name__=="__main__":